@@ -13,4 +13,27 @@ REPLY_TO_EMAIL=config('REPLY_TO_EMAIL')
 FRONTEND_URL = config('FRONTEND_URL')
 CORS_ORIGINS = config('CORS_ORIGINS').split(',')
 ALLOWED_METHODS= config('ALLOWED_METHODS').split(',')
-ALLOWED_HEADERS= config('ALLOWED_HEADERS').split(',')
\ No newline at end of file
+ALLOWED_HEADERS= config('ALLOWED_HEADERS').split(',')
+
+SCHEDULER_ENGINE = config('SCHEDULER_ENGINE', default='interval')
+SCHEDULER_TIME_QUANTUM = config('SCHEDULER_TIME_QUANTUM', default=15, cast=int)
+SCHEDULER_HORIZON_WEEKS = config('SCHEDULER_HORIZON_WEEKS', default=0, cast=int)
+SCHEDULER_COARSE_THRESHOLD = config('SCHEDULER_COARSE_THRESHOLD', default=20000, cast=int)
+SCHEDULER_GREEDY_HINTS = config('SCHEDULER_GREEDY_HINTS', default=True, cast=bool)
+SCHEDULER_SOLVER_PROFILE = config('SCHEDULER_SOLVER_PROFILE', default='balanced')
+SCHEDULER_WEIGHT_TEACHER_GAPS = config('SCHEDULER_WEIGHT_TEACHER_GAPS', default=1, cast=int)
+SCHEDULER_WEIGHT_CLASS_SPREAD = config('SCHEDULER_WEIGHT_CLASS_SPREAD', default=1, cast=int)
+SCHEDULER_WEIGHT_PREFERRED_WINDOWS = config('SCHEDULER_WEIGHT_PREFERRED_WINDOWS', default=60, cast=int)
+SCHEDULER_WEIGHT_WEEKLY_LOAD = config('SCHEDULER_WEIGHT_WEEKLY_LOAD', default=1, cast=int)
+SCHEDULER_PREFERRED_WINDOWS = [
+    tuple(int(minute) for minute in window.split('-'))
+    for window in config('SCHEDULER_PREFERRED_WINDOWS', default='').split(',') if window
+]
+SCHEDULER_OBJECTIVE_MIN_TIME = config('SCHEDULER_OBJECTIVE_MIN_TIME', default=15, cast=float)
+
+SOLVER_MAX_WORKERS = config('SOLVER_MAX_WORKERS', default=2, cast=int)
+SOLVER_MAX_QUEUE = config('SOLVER_MAX_QUEUE', default=8, cast=int)
+SOLVER_NUM_WORKERS = config('SOLVER_NUM_WORKERS', default=0, cast=int)
+SOLVER_LOG_SEARCH = config('SOLVER_LOG_SEARCH', default=False, cast=bool)
+SCHEDULE_JOB_TTL = config('SCHEDULE_JOB_TTL', default=3600, cast=int)
+SCHEDULE_VERSIONS_KEPT = config('SCHEDULE_VERSIONS_KEPT', default=1, cast=int)
\ No newline at end of file
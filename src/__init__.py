@@ -9,6 +9,7 @@ from src.apps.schedules import (AssignmentSubjectsRouter, AvailabilitiesRouter,
                                 YearsGroupsEducationalCoursesRouter,
                                 YearsGroupsRouter, AiRouter)
 from src.apps.users import InvitationRouter, UserRouter
+from src.config.solver_service import solver_executor
 
 app = FastAPI(
     title="Planify API with documentation",
@@ -34,6 +35,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def start_solver_executor():
+    solver_executor.start()
+
+
+@app.on_event("shutdown")
+def shutdown_solver_executor():
+    solver_executor.shutdown()
+
 # Routers
 app.include_router(UserRouter)
 app.include_router(InvitationRouter)
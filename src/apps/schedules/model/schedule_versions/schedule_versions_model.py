@@ -0,0 +1,29 @@
+from sqlalchemy import TIMESTAMP, Column, Enum, ForeignKey, Index, Integer, func, text
+from sqlalchemy.orm import relationship
+
+from src.models import Base
+
+
+class ScheduleVersion(Base):
+    __tablename__ = "schedule_versions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    classes_id = Column(Integer, ForeignKey("classes.id", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(
+        Enum("Building", "Active", "Superseded", name="schedule_version_status_enum"),
+        nullable=False,
+        default="Building",
+    )
+    created_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+    activated_at = Column(TIMESTAMP, nullable=True)
+
+    class_info = relationship("Classes", backref="schedule_versions")
+
+    __table_args__ = (
+        Index(
+            "uq_schedule_versions_active_class",
+            "classes_id",
+            unique=True,
+            postgresql_where=text("status = 'Active'"),
+        ),
+    )
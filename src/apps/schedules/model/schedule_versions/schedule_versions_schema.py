@@ -0,0 +1,19 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from src.models import BaseSchema
+
+
+class ScheduleVersionStatus(str, Enum):
+    building = "Building"
+    active = "Active"
+    superseded = "Superseded"
+
+
+class ScheduleVersionResponse(BaseSchema):
+    id: int
+    classes_id: int
+    status: ScheduleVersionStatus
+    created_at: datetime
+    activated_at: Optional[datetime]
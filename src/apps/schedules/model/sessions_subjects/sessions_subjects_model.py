@@ -11,6 +11,7 @@ class SessionSubject(Base):
     id = Column(Integer, primary_key=True, index=True)
     classrooms_id = Column(Integer, ForeignKey("classrooms.id", ondelete="CASCADE"), nullable=True)
     assignments_subjects_id = Column(Integer, ForeignKey("assignments_subjects.id", ondelete="CASCADE"), nullable=False)
+    schedule_versions_id = Column(Integer, ForeignKey("schedule_versions.id", ondelete="CASCADE"), nullable=True, index=True)
     comment = Column(Text, nullable=True)
     status = Column(Enum("Pending", "Confirmed", "Refused", name="status_enum"), nullable=False, default="Pending")
     start_at = Column(TIMESTAMP, nullable=False)
@@ -18,3 +19,4 @@ class SessionSubject(Base):
 
     classroom_info = relationship("Classroom", backref="sessions_subjects")
     assignment_info = relationship("AssignmentSubject", backref="sessions_subjects")
+    schedule_version = relationship("ScheduleVersion", backref="sessions_subjects")
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 from pydantic import BaseModel, Field
 
@@ -43,9 +43,58 @@ class AssignmentSubjectInfo(BaseModel):
     subject_info: Optional[SubjectInfo]
     user_info: Optional[UserInfo]
 
-class SessionSubjectCreate(BaseModel):
+class ObjectiveWeights(BaseModel):
+    teacher_gaps: Optional[int] = Field(
+        default=None, ge=0, description="Weight of a minute a teacher waits between two sessions of a day"
+    )
+    class_spread: Optional[int] = Field(
+        default=None, ge=0, description="Weight of a minute a class waits between two sessions of a day"
+    )
+    preferred_windows: Optional[int] = Field(
+        default=None, ge=0, description="Weight of a session held outside the preferred time windows"
+    )
+    weekly_load: Optional[int] = Field(
+        default=None, ge=0, description="Weight of a minute between the busiest and the quietest week of a class"
+    )
+
+class ScheduleGenerationOptions(BaseModel):
+    time_quantum: Optional[int] = Field(
+        default=None, gt=0, description="Granularity in minutes of session start times (server default if omitted)"
+    )
+    warm_start: bool = Field(default=False, description="Start the search from the current timetable")
+    engine: Optional[str] = Field(
+        default=None, description="Scheduling engine: grid, interval, greedy or portfolio (server default if omitted)"
+    )
+    solver_profile: Optional[str] = Field(
+        default=None, description="Solver profile: preview, balanced or optimal (server default if omitted)"
+    )
+    time_limit: Optional[float] = Field(
+        default=None, gt=0, description="Seconds after which the best timetable found is returned (profile default if omitted)"
+    )
+    deadline: Optional[datetime] = Field(
+        default=None, description="Time by which the generated timetable must be returned"
+    )
+    horizon_weeks: Optional[int] = Field(
+        default=None, ge=0, description="Solve the calendar in windows of this many weeks, 0 for one model (server default if omitted)"
+    )
+    objective_weights: Optional[ObjectiveWeights] = Field(
+        default=None, description="Weights of the soft constraints, 0 to ignore one (server defaults for omitted ones)"
+    )
+    preferred_windows: Optional[List[tuple[int, int]]] = Field(
+        default=None, description="Start and end minutes of the day within which sessions should be held (server default if omitted)"
+    )
+
+class SessionSubjectCreate(ScheduleGenerationOptions):
     classes_id: int = Field(..., description="ID of the classe")
 
+class YearsGroupSessionsCreate(ScheduleGenerationOptions):
+    years_group_id: int = Field(..., description="ID of the years group")
+
+class SessionSubjectReplan(SessionSubjectCreate):
+    teacher_id: Optional[int] = Field(default=None, description="Teacher whose availability changed")
+    subject_id: Optional[int] = Field(default=None, description="Subject that changed")
+    day: Optional[date] = Field(default=None, description="Calendar day that changed")
+
 class SessionSubjectUpdate(BaseModel):
     classrooms_id: Optional[int] = Field(default=None, description="ID of the classroom (nullable)")
     assignments_subjects_id: Optional[int] = Field(default=None, description="ID of the assigned subject")
@@ -58,9 +107,31 @@ class SessionSubjectResponse(BaseModel):
     id: int
     classrooms_id: Optional[int]
     assignments_subjects_id: int
+    schedule_versions_id: Optional[int] = None
     comment: Optional[str]
     status: str
     start_at: datetime
     end_at: datetime
     classroom_info: Optional[ClassroomInfo]
-    assignment_info: Optional[AssignmentSubjectInfo]
\ No newline at end of file
+    assignment_info: Optional[AssignmentSubjectInfo]
+
+class ScheduleJobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+class ScheduleJobProgress(BaseModel):
+    elapsed: float = Field(default=0, description="Seconds spent solving so far")
+    objective: Optional[float] = Field(default=None, description="Objective of the best schedule found so far")
+    best_bound: Optional[float] = Field(default=None, description="Best known bound on the objective")
+    solutions: int = Field(default=0, description="Number of schedules found so far")
+
+class ScheduleJobResponse(BaseModel):
+    job_id: str
+    classes_id: int
+    status: ScheduleJobStatus
+    progress: ScheduleJobProgress
+    error: Optional[str]
+    created_at: datetime
+    finished_at: Optional[datetime]
@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.apps.schedules.model.sessions_subjects.sessions_subjects_schema import (
-    SessionSubjectCreate, SessionSubjectResponse, SessionSubjectUpdate)
+    ScheduleJobResponse, SessionSubjectCreate, SessionSubjectReplan, SessionSubjectResponse,
+    SessionSubjectUpdate, YearsGroupSessionsCreate)
+from src.apps.schedules.services.sessions_subjects.schedule_job_service import \
+    ScheduleJobService
 from src.apps.schedules.services.sessions_subjects.session_subject_service import \
     SessionSubjectService
 from src.config.database_service import get_db
@@ -19,6 +23,56 @@ async def create_session_subject(
 ):
     return await SessionSubjectService.create_session_subject(data, session)
 
+@router.post("/years-group")
+async def create_years_group_sessions(
+    data: YearsGroupSessionsCreate,
+    session: AsyncSession = Depends(get_db),
+    current_user=Depends(SecurityHelper.require_role("admin"))
+):
+    return await SessionSubjectService.create_years_group_sessions(data, session)
+
+@router.post("/replan")
+async def replan_class_sessions(
+    data: SessionSubjectReplan,
+    session: AsyncSession = Depends(get_db),
+    current_user=Depends(SecurityHelper.require_role("admin"))
+):
+    return await SessionSubjectService.replan_class_sessions(data, session)
+
+@router.post("/jobs", response_model=ScheduleJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_schedule_job(
+    data: SessionSubjectCreate,
+    current_user=Depends(SecurityHelper.require_role("admin"))
+):
+    return ScheduleJobService.submit_job(data)
+
+@router.get("/jobs/{job_id}", response_model=ScheduleJobResponse)
+async def get_schedule_job(
+    job_id: str,
+    current_user=Depends(SecurityHelper.require_role("admin"))
+):
+    return ScheduleJobService.get_job(job_id)
+
+@router.get("/jobs/{job_id}/events")
+async def stream_schedule_job_events(
+    job_id: str,
+    current_user=Depends(SecurityHelper.require_role("admin"))
+):
+    ScheduleJobService.get_job(job_id)
+    return StreamingResponse(
+        ScheduleJobService.stream_job_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/jobs/{job_id}/result", response_model=list[SessionSubjectResponse])
+async def get_schedule_job_result(
+    job_id: str,
+    session: AsyncSession = Depends(get_db),
+    current_user=Depends(SecurityHelper.require_role("admin"))
+):
+    return await ScheduleJobService.get_job_result(job_id, session)
+
 @router.get("/{session_subject_id}", response_model=SessionSubjectResponse)
 async def get_session_subject(
     session_subject_id: int,
@@ -0,0 +1,74 @@
+from datetime import datetime
+
+from loguru import logger
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import SCHEDULE_VERSIONS_KEPT
+from src.apps.schedules.model.schedule_versions.schedule_versions_model import ScheduleVersion
+from src.apps.schedules.model.schedule_versions.schedule_versions_schema import ScheduleVersionStatus
+
+
+class ScheduleVersionService:
+    """Service for the generated timetable versions of classes.
+
+    The methods only flush: the caller commits, so that writing a version's
+    sessions and swapping it in happen in one transaction.
+    """
+
+    @staticmethod
+    async def create_version(classes_id: int, session: AsyncSession) -> ScheduleVersion:
+        """Create a version, not yet visible to readers, to write generated sessions under"""
+        version = ScheduleVersion(classes_id=classes_id, status=ScheduleVersionStatus.building.value)
+        session.add(version)
+        await session.flush()
+        return version
+
+    @staticmethod
+    async def get_active_version_id(classes_id: int, session: AsyncSession) -> int | None:
+        result = await session.execute(
+            select(ScheduleVersion.id).where(
+                ScheduleVersion.classes_id == classes_id,
+                ScheduleVersion.status == ScheduleVersionStatus.active.value,
+            )
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def activate_version(version: ScheduleVersion, session: AsyncSession):
+        """Make ``version`` the active version of its class and supersede the previous one"""
+        await session.execute(
+            update(ScheduleVersion)
+            .where(
+                ScheduleVersion.classes_id == version.classes_id,
+                ScheduleVersion.status == ScheduleVersionStatus.active.value,
+            )
+            .values(status=ScheduleVersionStatus.superseded.value)
+        )
+        version.status = ScheduleVersionStatus.active.value
+        version.activated_at = datetime.now()
+        await session.flush()
+
+    @staticmethod
+    async def prune_versions(classes_id: int, session: AsyncSession, keep: int = SCHEDULE_VERSIONS_KEPT):
+        """Delete, with their sessions, the superseded versions of a class beyond the ``keep`` latest"""
+        kept = (
+            select(ScheduleVersion.id)
+            .where(
+                ScheduleVersion.classes_id == classes_id,
+                ScheduleVersion.status == ScheduleVersionStatus.superseded.value,
+            )
+            .order_by(ScheduleVersion.id.desc())
+            .limit(keep)
+        )
+        result = await session.execute(
+            delete(ScheduleVersion)
+            .where(
+                ScheduleVersion.classes_id == classes_id,
+                ScheduleVersion.status == ScheduleVersionStatus.superseded.value,
+                ScheduleVersion.id.not_in(kept.scalar_subquery()),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            logger.info(f"Pruned {result.rowcount} superseded schedule versions of class ID: {classes_id}")
@@ -0,0 +1,148 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from fastapi import HTTPException, status
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import SCHEDULE_JOB_TTL
+from src.apps.schedules.model.sessions_subjects.sessions_subjects_schema import (
+    ScheduleJobStatus, SessionSubjectCreate)
+from src.apps.schedules.services.sessions_subjects.session_subject_service import SessionSubjectService
+from src.config.database_service import AsyncSessionFactory
+
+EVENTS_INTERVAL = 1
+
+
+class ScheduleJob:
+    """State of a schedule generation running in the background."""
+
+    def __init__(self, data: SessionSubjectCreate):
+        self.id = uuid4().hex
+        self.data = data
+        self.status = ScheduleJobStatus.queued
+        self.progress = {"objective": None, "best_bound": None, "solutions": 0}
+        self.error = None
+        self.session_subject_ids = []
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.task = None
+
+    @property
+    def is_finished(self):
+        return self.status in (ScheduleJobStatus.completed, ScheduleJobStatus.failed)
+
+    def report(self, progress: dict):
+        """Records a progress report emitted by the solver."""
+        self.progress.update(
+            objective=progress["objective"],
+            best_bound=progress["best_bound"],
+            solutions=progress["solutions"],
+        )
+
+    def elapsed(self) -> float:
+        if not self.started_at:
+            return 0
+        return ((self.finished_at or datetime.now()) - self.started_at).total_seconds()
+
+    def to_response(self) -> dict:
+        return {
+            "job_id": self.id,
+            "classes_id": self.data.classes_id,
+            "status": self.status,
+            "progress": {**self.progress, "elapsed": self.elapsed()},
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class ScheduleJobService:
+    """Service for running schedule generations as background jobs.
+
+    Jobs are kept in memory by the worker process that accepted them, so the
+    follow-up requests of a job must reach the same worker.
+    """
+
+    jobs: dict[str, ScheduleJob] = {}
+
+    @staticmethod
+    def submit_job(data: SessionSubjectCreate) -> dict:
+        """Start generating the sessions of a class in the background"""
+        ScheduleJobService._prune_jobs()
+
+        job = ScheduleJob(data)
+        ScheduleJobService.jobs[job.id] = job
+        job.task = asyncio.create_task(ScheduleJobService._run_job(job))
+        logger.info(f"Schedule job {job.id} submitted for class ID: {data.classes_id}")
+        return job.to_response()
+
+    @staticmethod
+    async def _run_job(job: ScheduleJob):
+        job.status = ScheduleJobStatus.running
+        job.started_at = datetime.now()
+        try:
+            async with AsyncSessionFactory() as session:
+                session_subjects = await SessionSubjectService.create_session_subject(
+                    job.data, session, job.report
+                )
+            job.session_subject_ids = [session_subject.id for session_subject in session_subjects]
+            job.status = ScheduleJobStatus.completed
+            logger.info(f"Schedule job {job.id} completed with {len(job.session_subject_ids)} sessions")
+        except HTTPException as e:
+            job.error = str(e.detail)
+            job.status = ScheduleJobStatus.failed
+            logger.error(f"Schedule job {job.id} failed: {e.detail}")
+        except Exception as e:
+            job.error = "Failed to create session_subject"
+            job.status = ScheduleJobStatus.failed
+            logger.error(f"Unexpected error in schedule job {job.id}: {str(e)}")
+        finally:
+            job.finished_at = datetime.now()
+
+    @staticmethod
+    def _prune_jobs():
+        """Forget finished jobs older than the configured TTL"""
+        expiry = datetime.now() - timedelta(seconds=SCHEDULE_JOB_TTL)
+        for job_id, job in list(ScheduleJobService.jobs.items()):
+            if job.is_finished and job.finished_at < expiry:
+                del ScheduleJobService.jobs[job_id]
+
+    @staticmethod
+    def _get_job(job_id: str) -> ScheduleJob:
+        job = ScheduleJobService.jobs.get(job_id)
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Schedule job with ID {job_id} not found"
+            )
+        return job
+
+    @staticmethod
+    def get_job(job_id: str) -> dict:
+        """Fetch the status and progress of a job"""
+        return ScheduleJobService._get_job(job_id).to_response()
+
+    @staticmethod
+    async def stream_job_events(job_id: str):
+        """Yield the job progress as Server-Sent Events until the job finishes"""
+        job = ScheduleJobService._get_job(job_id)
+        while True:
+            payload = json.dumps(job.to_response(), default=str)
+            yield f"event: {job.status.value}\ndata: {payload}\n\n"
+            if job.is_finished:
+                return
+            await asyncio.sleep(EVENTS_INTERVAL)
+
+    @staticmethod
+    async def get_job_result(job_id: str, session: AsyncSession):
+        """Fetch the sessions generated by a completed job"""
+        job = ScheduleJobService._get_job(job_id)
+        if job.status == ScheduleJobStatus.failed:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Schedule job failed: {job.error}")
+        if job.status != ScheduleJobStatus.completed:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Schedule job is not finished yet")
+        return await SessionSubjectService.list_session_subjects_by_ids(job.session_subject_ids, session)
@@ -1,27 +1,45 @@
+import asyncio
 from datetime import datetime, timedelta, date
 
 from fastapi import HTTPException, status
 from loguru import logger
-from sqlalchemy import select
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload, joinedload
 
 from src.apps.schedules.model.classes.classes_model import Classes
 from src.apps.classrooms.model.classroom_model import Classroom
 from src.apps.schedules.model.assignments_subjects.assignments_subjects_model import AssignmentSubject
+from src.apps.schedules.model.schedule_versions.schedule_versions_model import ScheduleVersion
+from src.apps.schedules.model.schedule_versions.schedule_versions_schema import ScheduleVersionStatus
+from src.apps.schedules.services.schedule_versions.schedule_versions_service import ScheduleVersionService
 from src.apps.schedules.services.assignments_subjects.assignments_subjects_services import AssignmentsSubjectsService
 from src.apps.schedules.model.classes.classes_model import Classes
 from src.apps.schedules.services.classes.classes_service import ClassService
 from src.apps.schedules.model.sessions_subjects.sessions_subjects_model import SessionSubject
 from src.apps.schedules.model.sessions_subjects.sessions_subjects_schema import (
-    SessionSubjectCreate, SessionSubjectUpdate)
+    ScheduleGenerationOptions, SessionSubjectCreate, SessionSubjectReplan, SessionSubjectUpdate,
+    YearsGroupSessionsCreate)
 from src.apps.schedules.model.subjects.subjects_model import Subjects
+from src.apps.schedules.model.years_groups.years_groups_model import YearsGroups
 from src.apps.users.model.user.user_model import User
 from src.helpers import ValidationHelper
-from src.libraries import Combinator
+from config import (
+    SCHEDULER_COARSE_THRESHOLD, SCHEDULER_ENGINE, SCHEDULER_GREEDY_HINTS, SCHEDULER_HORIZON_WEEKS,
+    SCHEDULER_OBJECTIVE_MIN_TIME, SCHEDULER_PREFERRED_WINDOWS, SCHEDULER_SOLVER_PROFILE, SCHEDULER_TIME_QUANTUM,
+    SCHEDULER_WEIGHT_CLASS_SPREAD, SCHEDULER_WEIGHT_PREFERRED_WINDOWS, SCHEDULER_WEIGHT_TEACHER_GAPS,
+    SCHEDULER_WEIGHT_WEEKLY_LOAD, SOLVER_LOG_SEARCH, SOLVER_MAX_WORKERS, SOLVER_NUM_WORKERS)
+from src.config.solver_service import solver_executor
+from src.libraries import (
+    SolverQueueFullError, allocate_rooms, analyze_feasibility, get_engine, get_solver_profile, solver_parameters)
 from src.apps.schedules.services.years_groups_educational_courses.years_groups_educational_courses_service import YearsGroupsEducationalCoursesService
 from src.apps.schedules.model.sessions_subjects.sessions_subjects_schema  import SessionStatus
 
+# Seconds kept before a request deadline to save the generated schedule
+DEADLINE_MARGIN = 2
+# Minutes of a session for subjects without a session duration
+DEFAULT_SESSION_DURATION = 240
+
 class SessionSubjectService:
     """Service for managing sessions_subjects"""
 
@@ -74,59 +92,44 @@ class SessionSubjectService:
         return session_subject
 
     @staticmethod
-    async def create_session_subject(data: SessionSubjectCreate, session: AsyncSession):
-        """Create a new session_subject"""
+    async def create_session_subject(
+        data: SessionSubjectCreate, session: AsyncSession, on_progress=None, hints=None, fixed_sessions=None
+    ):
+        """Create a new session_subject
+
+        ``on_progress`` receives the solver progress reports while the schedule is being generated.
+        ``hints`` and ``fixed_sessions`` are session records warm-starting the solver and pinned as is.
+        """
         try:
             existing_class = await ClassService.get_class_by_id(data.classes_id, session)
             if not existing_class:
                 raise ValueError(f"Class with ID {data.classes_id} not found")
             
-            as_query = (
-                select(AssignmentSubject)
-                .options(
-                    joinedload(AssignmentSubject.class_info),
-                    joinedload(AssignmentSubject.subject_info),
-                    joinedload(AssignmentSubject.user_info).selectinload(User.availabilities)
-                )
-                .where(AssignmentSubject.classes_id == data.classes_id)
-            )
-            as_result = await session.execute(as_query)
-            assignedSubjects = as_result.scalars().all()
+            assignedSubjects = await SessionSubjectService._load_assigned_subjects([data.classes_id], session)
             if not assignedSubjects:
                 raise ValueError(f"No assigned subjects found for class with ID {data.classes_id}")
-            
-            assignedSubjects =  SessionSubjectService._cast_to_combinator_struct(assignedSubjects)
-            calendar = await YearsGroupsEducationalCoursesService.get_year_group_educational_class_by_year_group(
-                existing_class.years_group_id, session
+
+            if hints is None and data.warm_start:
+                hints = await SessionSubjectService._load_schedule_hints(data.classes_id, session)
+
+            planned_sessions, time_quantum = await SessionSubjectService._solve_schedule(
+                assignedSubjects, existing_class.years_group_id, data, session, on_progress, hints, fixed_sessions
+            )
+            logger.info(f"Combinator stats for class {data.classes_id}: {planned_sessions.get('stats')}")
+
+            session_subjects = await SessionSubjectService._save_schedule_versions(
+                {data.classes_id: planned_sessions.get("sessions")}, time_quantum, session
             )
-            t_calendar = SessionSubjectService._transform_calendar(calendar)
-            session_duration = 240
-            days_time_slot = (480, 1200)
-            nb_rooms= 5
-
-            combinator = Combinator(t_calendar, assignedSubjects, session_duration, days_time_slot, nb_rooms)
-            planned_sessions = combinator.solve()
-            if planned_sessions.get("status") == "INFEASIBLE":
-                raise HTTPException(status_code=400, detail="No feasible schedule found")
-            
-            session_subjects = []
-            for session_data in planned_sessions.get("sessions"):
-                start_at = SessionSubjectService.generate_timestamp(session_data['day'], session_data['start_time'])
-                end_at = SessionSubjectService.generate_timestamp(session_data['day'], session_data['end_time'])
-                session_subject = SessionSubject(
-                    assignments_subjects_id=int(session_data.get('course_id')),
-                    start_at=start_at,
-                    end_at=end_at,
-                    status=SessionStatus.pending,
-                )
-                session.add(session_subject)
-                await session.commit()
-                session_subjects.append(session_subject)
-                
             return session_subjects
         except ValueError as e:
             logger.error(f"Validation error: {str(e)}")
             raise HTTPException(status_code=400, detail=f"Validation error: {str(e)}")
+        except SolverQueueFullError as e:
+            logger.warning(f"Schedule generation rejected: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many schedules are being generated, please retry later"
+            )
         except HTTPException as e:
             logger.error(f"HTTP Exception during creation: {e.detail}")
             raise e
@@ -137,6 +140,361 @@ class SessionSubjectService:
                 detail="Failed to create session_subject"
             )
 
+    @staticmethod
+    async def create_years_group_sessions(data: YearsGroupSessionsCreate, session: AsyncSession, on_progress=None):
+        """Generate the sessions of every class of a years group with one joint model
+
+        Teachers and rooms are shared by all the classes, so a teacher giving
+        courses to several classes is never double-booked.
+        """
+        try:
+            await ValidationHelper.validate_id(YearsGroups, data.years_group_id, session, "YearsGroup")
+
+            classes_result = await session.execute(
+                select(Classes.id).where(Classes.years_group_id == data.years_group_id)
+            )
+            classes_ids = classes_result.scalars().all()
+            if not classes_ids:
+                raise ValueError(f"No classes found for years group with ID {data.years_group_id}")
+
+            assignedSubjects = await SessionSubjectService._load_assigned_subjects(classes_ids, session)
+            if not assignedSubjects:
+                raise ValueError(f"No assigned subjects found for years group with ID {data.years_group_id}")
+
+            hints = None
+            if data.warm_start:
+                hints = []
+                for classes_id in classes_ids:
+                    hints.extend(await SessionSubjectService._load_schedule_hints(classes_id, session))
+
+            planned_sessions, time_quantum = await SessionSubjectService._solve_schedule(
+                assignedSubjects, data.years_group_id, data, session, on_progress, hints
+            )
+            logger.info(f"Combinator stats for years group {data.years_group_id}: {planned_sessions.get('stats')}")
+
+            planned_by_class = {classes_id: [] for classes_id in classes_ids}
+            for session_data in planned_sessions.get("sessions"):
+                planned_by_class[session_data["class_id"]].append(session_data)
+            planned_by_class = {
+                classes_id: planned for classes_id, planned in planned_by_class.items() if planned
+            }
+
+            return await SessionSubjectService._save_schedule_versions(planned_by_class, time_quantum, session)
+        except ValueError as e:
+            logger.error(f"Validation error: {str(e)}")
+            raise HTTPException(status_code=400, detail=f"Validation error: {str(e)}")
+        except SolverQueueFullError as e:
+            logger.warning(f"Schedule generation rejected: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many schedules are being generated, please retry later"
+            )
+        except HTTPException as e:
+            logger.error(f"HTTP Exception during years group generation: {e.detail}")
+            raise e
+        except Exception as e:
+            logger.error(f"Unexpected error generating years group sessions: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to generate years group sessions"
+            )
+
+    @staticmethod
+    async def _load_assigned_subjects(classes_ids: list[int], session: AsyncSession):
+        """Load the assigned subjects of classes with their subject, teacher and availabilities."""
+        as_query = (
+            select(AssignmentSubject)
+            .options(
+                joinedload(AssignmentSubject.class_info),
+                joinedload(AssignmentSubject.subject_info),
+                joinedload(AssignmentSubject.user_info).selectinload(User.availabilities)
+            )
+            .where(AssignmentSubject.classes_id.in_(classes_ids))
+        )
+        as_result = await session.execute(as_query)
+        return as_result.scalars().all()
+
+    @staticmethod
+    async def _solve_schedule(
+        assigned_subjects, years_group_id: int, data: ScheduleGenerationOptions, session: AsyncSession,
+        on_progress=None, hints=None, fixed_sessions=None,
+    ):
+        """Run the combinator over assigned subjects sharing the calendar of a years group.
+
+        Returns the combinator result and the time quantum it was computed with.
+        """
+        engine = data.engine or SCHEDULER_ENGINE
+        get_engine(engine)
+        profile = get_solver_profile(data.solver_profile or SCHEDULER_SOLVER_PROFILE)
+        time_limit = SessionSubjectService._solve_time_limit(profile, data)
+        time_quantum = data.time_quantum or SCHEDULER_TIME_QUANTUM
+        horizon_weeks = SCHEDULER_HORIZON_WEEKS if data.horizon_weeks is None else data.horizon_weeks
+        courses = SessionSubjectService._cast_to_combinator_struct(assigned_subjects, time_quantum)
+        calendar = await YearsGroupsEducationalCoursesService.get_year_group_educational_class_by_year_group(
+            years_group_id, session
+        )
+        t_calendar = SessionSubjectService._transform_calendar(calendar)
+        session_duration = DEFAULT_SESSION_DURATION
+        days_time_slot = (480, 1200)
+        rooms_result = await session.execute(select(Classroom.id, Classroom.capacity))
+        rooms = [{"id": room_id, "capacity": capacity} for room_id, capacity in rooms_result.all()]
+        # Every room the smallest class fits in counts; larger classes are bounded by the rooms fitting them
+        smallest_class = min((course["students"] for course in courses), default=0)
+        nb_rooms = sum(1 for room in rooms if room["capacity"] >= smallest_class)
+        # Rooms held by the other classes' schedules are only free to the solver outside their bookings
+        bookings = await SessionSubjectService._load_room_bookings(
+            {course["class_id"] for course in courses}, t_calendar, session
+        )
+        capacities = {room["id"]: room["capacity"] for room in rooms}
+
+        arguments = {
+            "calendar": t_calendar,
+            "courses": courses,
+            "session_duration": session_duration,
+            "days_time_slot": days_time_slot,
+            "nb_rooms": nb_rooms,
+            "room_capacities": [room["capacity"] for room in rooms],
+            "room_bookings": [{**booking, "capacity": capacities[booking["classroom_id"]]} for booking in bookings],
+            "time_quantum": time_quantum,
+            "hints": hints,
+            "fixed_sessions": fixed_sessions,
+            "coarse_threshold": SCHEDULER_COARSE_THRESHOLD,
+            "objective_weights": SessionSubjectService._objective_weights(data),
+            "preferred_windows": SCHEDULER_PREFERRED_WINDOWS if data.preferred_windows is None else data.preferred_windows,
+            "objective_min_time": SCHEDULER_OBJECTIVE_MIN_TIME,
+            "parameters": solver_parameters(profile, SOLVER_NUM_WORKERS, SOLVER_MAX_WORKERS, SOLVER_LOG_SEARCH),
+        }
+        conflicts = await asyncio.to_thread(analyze_feasibility, arguments)
+        if conflicts:
+            logger.warning(f"Schedule inputs are infeasible: {[conflict['message'] for conflict in conflicts]}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"message": "The schedule cannot be generated from the current data", "conflicts": conflicts},
+            )
+
+        planned_sessions = await solver_executor.solve(engine, arguments, on_progress, {
+            "horizon_weeks": horizon_weeks,
+            "greedy_hints": SCHEDULER_GREEDY_HINTS,
+            "time_limit": time_limit,
+        })
+        if planned_sessions.get("conflicts"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"message": "No feasible schedule found", "conflicts": planned_sessions["conflicts"]},
+            )
+        if "sessions" not in planned_sessions:
+            raise HTTPException(
+                status_code=400, detail=f"No feasible schedule found (solver status: {planned_sessions.get('status')})"
+            )
+
+        if fixed_sessions:
+            SessionSubjectService._carry_over_fixed_sessions(planned_sessions["sessions"], fixed_sessions)
+        room_stats = await asyncio.to_thread(allocate_rooms, planned_sessions["sessions"], courses, rooms, bookings)
+        planned_sessions["stats"]["rooms"] = room_stats
+        if room_stats["unallocated"]:
+            logger.warning(f"{room_stats['unallocated']} planned sessions could not be given a classroom")
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=(
+                    f"{room_stats['unallocated']} planned sessions could not be given a classroom: "
+                    "no classroom large enough is free at their times"
+                ),
+            )
+        return planned_sessions, time_quantum
+
+    @staticmethod
+    def _carry_over_fixed_sessions(planned_sessions: list[dict], fixed_sessions: list[dict]):
+        """Copy the status, comment and classroom of the kept sessions onto the planned sessions left in their place."""
+        kept = {}
+        for record in fixed_sessions:
+            kept.setdefault((record["course_id"], str(record["day"]), record["start_time"]), []).append(record)
+        for planned in planned_sessions:
+            records = kept.get((planned["course_id"], str(planned["day"]), planned["start_time"]))
+            if records:
+                record = records.pop()
+                planned.update(
+                    status=record.get("status"), comment=record.get("comment"), classroom_id=record.get("classroom_id")
+                )
+
+    @staticmethod
+    async def _load_room_bookings(classes_ids: set[int], calendar: list[dict], session: AsyncSession) -> list[dict]:
+        """Load the classrooms held by the active schedules of other classes over the days of ``calendar``."""
+        if not calendar:
+            return []
+        first_day = min(day["date"] for day in calendar)
+        last_day = max(day["date"] for day in calendar)
+        result = await session.execute(
+            select(SessionSubject.classrooms_id, SessionSubject.start_at, SessionSubject.end_at)
+            .join(SessionSubject.schedule_version)
+            .where(
+                ScheduleVersion.status == ScheduleVersionStatus.active.value,
+                ScheduleVersion.classes_id.not_in(classes_ids),
+                SessionSubject.classrooms_id.is_not(None),
+                SessionSubject.start_at >= datetime.combine(first_day, datetime.min.time()),
+                SessionSubject.start_at < datetime.combine(last_day + timedelta(days=1), datetime.min.time()),
+            )
+        )
+        return [
+            {
+                "classroom_id": classrooms_id,
+                "day": start_at.date(),
+                "start_time": start_at.hour * 60 + start_at.minute,
+                "end_time": end_at.hour * 60 + end_at.minute,
+            }
+            for classrooms_id, start_at, end_at in result.all()
+        ]
+
+    @staticmethod
+    def _objective_weights(data: ScheduleGenerationOptions) -> dict:
+        """Weights of the soft constraints: the requested ones, the server defaults for the others."""
+        weights = {
+            "teacher_gaps": SCHEDULER_WEIGHT_TEACHER_GAPS,
+            "class_spread": SCHEDULER_WEIGHT_CLASS_SPREAD,
+            "preferred_windows": SCHEDULER_WEIGHT_PREFERRED_WINDOWS,
+            "weekly_load": SCHEDULER_WEIGHT_WEEKLY_LOAD,
+        }
+        if data.objective_weights:
+            weights.update(data.objective_weights.dict(exclude_none=True))
+        return weights
+
+    @staticmethod
+    def _solve_time_limit(profile: dict, data: ScheduleGenerationOptions) -> float:
+        """Seconds the solve may take: the tightest of the profile limit, the requested limit and the deadline."""
+        limits = [profile["time_limit"]]
+        if data.time_limit:
+            limits.append(data.time_limit)
+        if data.deadline:
+            now = datetime.now(data.deadline.tzinfo)
+            seconds_left = (data.deadline - now).total_seconds() - DEADLINE_MARGIN
+            if seconds_left <= 0:
+                raise ValueError("The deadline leaves no time to generate the schedule")
+            limits.append(seconds_left)
+        return min(limits)
+
+    @staticmethod
+    async def replan_class_sessions(data: SessionSubjectReplan, session: AsyncSession, on_progress=None):
+        """Re-plan only the sessions of a class affected by a change, keeping all the others in place"""
+        if data.teacher_id is None and data.subject_id is None and data.day is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Provide the changed teacher_id, subject_id or day to re-plan."
+            )
+
+        active_version_id = await ScheduleVersionService.get_active_version_id(data.classes_id, session)
+        if active_version_id is None:
+            logger.info(f"No timetable to re-plan for class ID: {data.classes_id}, generating it in full")
+            return await SessionSubjectService.create_session_subject(data, session, on_progress)
+
+        result = await session.execute(
+            select(
+                SessionSubject.assignments_subjects_id,
+                SessionSubject.start_at,
+                SessionSubject.status,
+                SessionSubject.comment,
+                SessionSubject.classrooms_id,
+                AssignmentSubject.users_id,
+                AssignmentSubject.subjects_id,
+            )
+            .join(SessionSubject.assignment_info)
+            .where(SessionSubject.schedule_versions_id == active_version_id)
+        )
+
+        affected_sessions, fixed_sessions = [], []
+        for assignments_subjects_id, start_at, session_status, comment, classrooms_id, users_id, subjects_id in result.all():
+            # Kept sessions carry their decisions and classroom over to the new version
+            record = {
+                "course_id": assignments_subjects_id,
+                "day": start_at.date(),
+                "start_time": start_at.hour * 60 + start_at.minute,
+                "status": session_status,
+                "comment": comment,
+                "classroom_id": classrooms_id,
+            }
+            is_affected = (
+                users_id == data.teacher_id
+                or subjects_id == data.subject_id
+                or start_at.date() == data.day
+            )
+            (affected_sessions if is_affected else fixed_sessions).append(record)
+
+        logger.info(
+            f"Re-planning {len(affected_sessions)} sessions of class ID: {data.classes_id}, "
+            f"{len(fixed_sessions)} kept in place"
+        )
+        return await SessionSubjectService.create_session_subject(
+            data, session, on_progress, hints=affected_sessions, fixed_sessions=fixed_sessions
+        )
+
+    @staticmethod
+    async def _load_schedule_hints(classes_id: int, session: AsyncSession) -> list[dict]:
+        """Load the active sessions of a class in the shape of the combinator output, to warm-start it."""
+        active_version_id = await ScheduleVersionService.get_active_version_id(classes_id, session)
+        if active_version_id is None:
+            return []
+
+        result = await session.execute(
+            select(SessionSubject.assignments_subjects_id, SessionSubject.start_at)
+            .where(SessionSubject.schedule_versions_id == active_version_id)
+        )
+        return [
+            {
+                "course_id": assignments_subjects_id,
+                "day": start_at.date(),
+                "start_time": start_at.hour * 60 + start_at.minute,
+            }
+            for assignments_subjects_id, start_at in result.all()
+        ]
+
+    @staticmethod
+    async def _save_schedule_versions(
+        planned_by_class: dict[int, list[dict]], time_quantum: int, session: AsyncSession
+    ):
+        """Write the planned sessions of each class under a new schedule version and swap them in, in one transaction."""
+        session_subjects = []
+        try:
+            for classes_id, planned_sessions in planned_by_class.items():
+                version = await ScheduleVersionService.create_version(classes_id, session)
+                session_subjects.extend(await SessionSubjectService._bulk_insert_session_subjects(
+                    planned_sessions, time_quantum, version.id, session
+                ))
+                await ScheduleVersionService.activate_version(version, session)
+                await ScheduleVersionService.prune_versions(classes_id, session)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+        logger.info(f"New schedule versions are active for class IDs: {list(planned_by_class)}")
+        return session_subjects
+
+    @staticmethod
+    async def _bulk_insert_session_subjects(
+        planned_sessions: list[dict], time_quantum: int, schedule_versions_id: int, session: AsyncSession
+    ):
+        """Insert the planned sessions with one multi-row INSERT ... RETURNING, without committing."""
+        rows = [
+            {
+                "assignments_subjects_id": int(session_data.get('course_id')),
+                "classrooms_id": session_data.get('classroom_id'),
+                "schedule_versions_id": schedule_versions_id,
+                "start_at": SessionSubjectService.generate_timestamp(
+                    session_data['day'], session_data['start_time'], time_quantum
+                ),
+                # Only starts are on the quantum grid; sessions end after their exact duration
+                "end_at": SessionSubjectService.generate_timestamp(session_data['day'], session_data['end_time']),
+                "status": session_data.get('status') or SessionStatus.pending.value,
+                "comment": session_data.get('comment'),
+            }
+            for session_data in planned_sessions
+        ]
+        if not rows:
+            return []
+
+        result = await session.scalars(insert(SessionSubject).returning(SessionSubject), rows)
+        session_subjects = result.all()
+        logger.info(f"Inserted {len(session_subjects)} SessionSubjects in one statement")
+        return session_subjects
+
     @staticmethod
     async def get_session_subject_by_id(session_subject_id: int, session: AsyncSession):
         """Fetch a session_subject by ID with related entities"""
@@ -174,6 +532,23 @@ class SessionSubjectService:
                 detail="Failed to list session_subjects"
             )
 
+    @staticmethod
+    async def list_session_subjects_by_ids(session_subject_ids: list[int], session: AsyncSession):
+        """List the session_subjects with the given IDs"""
+        query = (
+            select(SessionSubject)
+            .options(
+                selectinload(SessionSubject.classroom_info),
+                selectinload(SessionSubject.assignment_info).selectinload(AssignmentSubject.class_info),
+                selectinload(SessionSubject.assignment_info).selectinload(AssignmentSubject.subject_info),
+                selectinload(SessionSubject.assignment_info).selectinload(AssignmentSubject.user_info),
+            )
+            .where(SessionSubject.id.in_(session_subject_ids))
+            .order_by(SessionSubject.start_at)
+        )
+        result = await session.execute(query)
+        return result.scalars().all()
+
     @staticmethod
     async def update_session_subject(session_subject_id: int, data: SessionSubjectUpdate, session: AsyncSession):
         """Update an existing session_subject"""
@@ -246,7 +621,11 @@ class SessionSubjectService:
                 selectinload(SessionSubject.assignment_info).selectinload(AssignmentSubject.user_info),
             )
             .join(SessionSubject.assignment_info)
-            .where(AssignmentSubject.users_id == teacher_id)
+            .join(SessionSubject.schedule_version)
+            .where(
+                AssignmentSubject.users_id == teacher_id,
+                ScheduleVersion.status == ScheduleVersionStatus.active.value,
+            )
         )
 
         result = await session.execute(query)
@@ -258,6 +637,11 @@ class SessionSubjectService:
     async def get_class_sessions(class_id: int, session: AsyncSession):
         await ValidationHelper.validate_id(Classes, class_id, session, "Classes")
 
+        active_version_id = await ScheduleVersionService.get_active_version_id(class_id, session)
+        if active_version_id is None:
+            logger.info(f"No active schedule version for class ID: {class_id}")
+            return []
+
         query = (
             select(SessionSubject)
             .options(
@@ -266,8 +650,7 @@ class SessionSubjectService:
                 selectinload(SessionSubject.assignment_info).selectinload(AssignmentSubject.subject_info),
                 selectinload(SessionSubject.assignment_info).selectinload(AssignmentSubject.user_info),
             )
-            .join(SessionSubject.assignment_info)
-            .where(AssignmentSubject.classes_id == class_id)
+            .where(SessionSubject.schedule_versions_id == active_version_id)
         )
 
         result = await session.execute(query)
@@ -288,7 +671,11 @@ class SessionSubjectService:
                 selectinload(SessionSubject.assignment_info).selectinload(AssignmentSubject.user_info),
             )
             .join(SessionSubject.assignment_info)
-            .where(AssignmentSubject.subjects_id == subject_id)
+            .join(SessionSubject.schedule_version)
+            .where(
+                AssignmentSubject.subjects_id == subject_id,
+                ScheduleVersion.status == ScheduleVersionStatus.active.value,
+            )
         )
 
         result = await session.execute(query)
@@ -297,7 +684,8 @@ class SessionSubjectService:
         return sessions
     
     @staticmethod
-    def _parse_availability(availabilities):
+    def _parse_availability(availabilities, time_quantum: int = 1):
+        """Maps availability slots to minute intervals per day, shrunk onto the time quantum grid."""
         availability = {}
         for availability_item in availabilities:
             slots = availability_item.slots
@@ -305,9 +693,11 @@ class SessionSubjectService:
                 start = datetime.fromisoformat(slot["start_at"])
                 end = datetime.fromisoformat(slot["end_at"])
                 date_key = start.strftime("%Y-%m-%d")
-                start_minutes = start.hour * 60 + start.minute
-                end_minutes = end.hour * 60 + end.minute
-                
+                start_minutes = -(-(start.hour * 60 + start.minute) // time_quantum) * time_quantum
+                end_minutes = (end.hour * 60 + end.minute) // time_quantum * time_quantum
+                if end_minutes <= start_minutes:
+                    continue
+
                 if date_key not in availability:
                     availability[date_key] = []
                 availability[date_key].append((start_minutes, end_minutes))
@@ -316,20 +706,31 @@ class SessionSubjectService:
     
 
     @staticmethod
-    def _cast_to_combinator_struct(data):
+    def _cast_to_combinator_struct(data, time_quantum: int = 1):
         courses = []
+        # Teachers shared by several classes get one availability structure
+        availabilities = {}
         for item in data:
+            if item.user_info.id not in availabilities:
+                availabilities[item.user_info.id] = SessionSubjectService._parse_availability(
+                    item.user_info.availabilities, time_quantum
+                ) if item.user_info.availabilities else {}
             course = {
                 "id": item.id,
+                "class_id": item.classes_id,
+                "students": item.class_info.number_students,
                 "name": item.subject_info.name,
-                "hourly_volume": item.subject_info.hourly_volume,
+                # Subjects count hours, the engines minutes
+                "hourly_volume": round((item.subject_info.hourly_volume or 0) * 60),
+                "session_duration": round(
+                    (item.subject_info.session_duration or 0) * 60
+                ) or DEFAULT_SESSION_DURATION,
                 "start_date": item.subject_info.start_at,
                 "end_date": item.subject_info.end_at,
                 "teacher": {
                     "id": item.user_info.id,
                     "name": f"{item.user_info.first_name} {item.user_info.last_name}",
-                    "availability": SessionSubjectService._parse_availability(item.user_info.availabilities)
-                    if item.user_info.availabilities else {}
+                    "availability": availabilities[item.user_info.id],
                 },
             }
             courses.append(course)
@@ -348,13 +749,15 @@ class SessionSubjectService:
         return transformed_calendar
     
     @staticmethod
-    def generate_timestamp(day: date | str, start_time: int) -> datetime:
+    def generate_timestamp(day: date | str, start_time: int, time_quantum: int = 1) -> datetime:
         if isinstance(day, date):
             day_datetime = datetime.combine(day, datetime.min.time())
         elif isinstance(day, str):
             day_datetime = datetime.strptime(day, "%Y-%m-%d")
         else:
             raise ValueError("Le paramètre 'day' doit être de type datetime.date ou une chaîne au format 'YYYY-MM-DD'.")
-        timestamp = day_datetime + timedelta(minutes=start_time)
+        # Offsets are rounded up to the quantum grid, 1 minute when not given
+        minutes = -(-start_time // time_quantum) * time_quantum
+        timestamp = day_datetime + timedelta(minutes=minutes)
         
         return timestamp
\ No newline at end of file
@@ -0,0 +1,4 @@
+from config import *
+from src.libraries import SolverExecutor
+
+solver_executor = SolverExecutor(max_workers=SOLVER_MAX_WORKERS, max_queue=SOLVER_MAX_QUEUE)
@@ -1 +1,11 @@
-from src.libraries.ortools.combinator import *
\ No newline at end of file
+from src.libraries.ortools.combinator import *
+from src.libraries.ortools.interval_combinator import *
+from src.libraries.ortools.greedy_combinator import *
+from src.libraries.ortools.portfolio import *
+from src.libraries.ortools.profiles import *
+from src.libraries.ortools.feasibility import *
+from src.libraries.ortools.infeasibility import *
+from src.libraries.ortools.room_allocation import *
+from src.libraries.ortools.engines import *
+from src.libraries.ortools.decomposition import *
+from src.libraries.ortools.executor import *
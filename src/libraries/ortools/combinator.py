@@ -1,132 +1,1016 @@
+import time
+from datetime import timedelta
+
+import numpy as np
 from ortools.sat.python import cp_model
 
+MINUTES_PER_DAY = 1440
+# Start minute splitting the morning and afternoon buckets of the coarse stage
+MIDDAY = 780
+# Default weights of the soft constraints minimized by the solvers, 0 leaving one out of the model:
+# idle minutes of a teacher or a class between their first and last session of a day, sessions
+# outside the preferred time windows, and minutes between the busiest and quietest week of a class
+OBJECTIVE_WEIGHTS = {
+    "teacher_gaps": 1,
+    "class_spread": 1,
+    "preferred_windows": 60,
+    "weekly_load": 1,
+}
+
+
+def within_period(day, start_date=None, end_date=None):
+    """Tells whether ``day`` lies between ``start_date`` and ``end_date``, a missing bound leaving that side open."""
+    return not (start_date and day < start_date) and not (end_date and day > end_date)
+
+
+def room_limits(courses, nb_rooms, room_capacities=None):
+    """Bounds the sessions held at once: ``(students, limit)`` pairs, from the loosest to the tightest.
+
+    Sessions of classes of at least ``students`` students are at most
+    ``limit`` at any time. The first pair covers every session with
+    ``nb_rooms``. Given the capacities of the rooms, every class size whose
+    rooms are fewer adds a pair; as the rooms fitting a class are nested by
+    size, the sessions held at any instant can then be matched to rooms.
+    """
+    limits = [(0, nb_rooms)]
+    if room_capacities:
+        for students in sorted({course.get('students') or 0 for course in courses}):
+            limit = sum(1 for capacity in room_capacities if capacity >= students)
+            if limit < limits[-1][1]:
+                limits.append((students, limit))
+    return limits
+
+
+def count_rooms(count):
+    """Names ``count`` rooms in a message: "no room", "1 room" or "3 rooms"."""
+    return "no room" if not count else f"{count} room{'s' if count > 1 else ''}"
+
+
+def booked_rooms(limits, room_capacities, bookings):
+    """Groups the rooms held by other schedules under the room limits whose rooms they take.
+
+    The rooms of a ``(students, limit)`` pair are its ``limit`` largest ones,
+    and all of them when their capacities are unknown. Returns, per pair, the
+    bookings of its rooms.
+    """
+    ranked = sorted(room_capacities or [], reverse=True)
+    booked = {}
+    for students, limit in limits:
+        smallest = ranked[min(limit, len(ranked)) - 1] if ranked and limit else None
+        booked[(students, limit)] = [
+            booking for booking in bookings or []
+            if limit and (smallest is None or booking['capacity'] >= smallest)
+        ]
+    return booked
+
+
+def peak_bookings(bookings):
+    """Returns the most ``(day, start_time, end_time)`` bookings held at the same instant."""
+    events = sorted(
+        [(day, start, 1) for day, start, _ in bookings] + [(day, end, -1) for day, _, end in bookings]
+    )
+    peak = held = 0
+    for _, _, change in events:
+        held += change
+        peak = max(peak, held)
+    return peak
+
+
+class ProgressCallback(cp_model.CpSolverSolutionCallback):
+    """Reports search progress each time the solver finds a solution."""
+
+    def __init__(self, progress):
+        super().__init__()
+        self.progress = progress
+        self.solutions = 0
+
+    def on_solution_callback(self):
+        self.solutions += 1
+        self.progress({
+            "elapsed": self.WallTime(),
+            "objective": self.ObjectiveValue(),
+            "best_bound": self.BestObjectiveBound(),
+            "solutions": self.solutions,
+        })
+
+
 class Combinator:
-    def __init__(self, calendar, courses, session_duration, days_time_slot, nb_rooms):
+    def __init__(
+        self, calendar, courses, session_duration, days_time_slot, nb_rooms, time_quantum=1,
+        hints=None, fixed_sessions=None, coarse_threshold=0, time_limit=None, parameters=None,
+        room_capacities=None, objective_weights=None, preferred_windows=None, objective_min_time=0,
+        optimize=None, room_bookings=None,
+    ):
+        if time_quantum <= 0 or MINUTES_PER_DAY % time_quantum:
+            raise ValueError(f"time_quantum must divide {MINUTES_PER_DAY} minutes, got {time_quantum}")
+        unknown = set(objective_weights or {}) - set(OBJECTIVE_WEIGHTS)
+        if unknown:
+            raise ValueError(
+                f"Unknown objective terms {', '.join(sorted(unknown))}. Available terms: {', '.join(OBJECTIVE_WEIGHTS)}."
+            )
+
         self.calendar = calendar
         self.courses = courses
         self.session_duration = session_duration
         self.days_time_slot = days_time_slot
         self.nb_rooms = nb_rooms
+        # Capacities of the rooms; courses of classes with more ``students`` than a room cannot use it
+        self.room_capacities = room_capacities
+        self.room_limits = room_limits(courses, nb_rooms, room_capacities)
+        # Rooms held by other schedules ({"classroom_id", "day", "start_time", "end_time", "capacity"}), not
+        # free meanwhile
+        self.room_bookings = room_bookings or []
+        self.time_quantum = time_quantum
+        # Previously scheduled sessions ({"course_id", "day", "start_time"}) used to warm-start the search
+        self.hints = hints or []
+        # Previously scheduled sessions kept exactly where they are; only the other sessions are solved
+        self.fixed_sessions = fixed_sessions or []
+        self.pinned = {}
+        # Above this many start candidates, a half-day model first picks where the sessions go (0 disables it)
+        self.coarse_threshold = coarse_threshold
+        self.refined = {}
+        # Wall-clock budget in seconds of the whole solve, and CP-SAT parameters overriding the defaults
+        self.time_limit = time_limit
+        self.parameters = parameters or {}
+        # Weights of the soft constraints, and the (start, end) minutes of the day sessions should stay within
+        self.objective_weights = {**OBJECTIVE_WEIGHTS, **(objective_weights or {})}
+        self.preferred_windows = preferred_windows or []
+        # Below this many seconds of budget, the search only looks for a feasible timetable, unless
+        # ``optimize`` already tells whether to minimize, e.g. for a subproblem of a larger solve
+        self.objective_min_time = objective_min_time
+        self.optimize = optimize
+        # Variables of the objective, hinted along with the starts: per session day its presence, start minute
+        # and whether it starts in a preferred window, per resource day its first and last minutes, per class
+        # its busiest and quietest weeks
+        self.start_variables = {}
+        self.preferred_literals = {}
+        self.resource_bounds = {}
+        self.week_bounds = {}
+        self.deadline = None
+        self.solver = None
+        self.stopped = False
 
         self.model = cp_model.CpModel()
-        self.start_hour, self.end_hour = days_time_slot
+        # Sessions may only start on multiples of the time quantum
+        start_hour, end_hour = days_time_slot
+        self.start_hour = -(-start_hour // time_quantum) * time_quantum
+        self.end_hour = end_hour
         self.course_days = [i for i, day in enumerate(calendar) if day['type'] == 'cours']
 
+    def time_slots(self, duration=None):
+        """Returns the minutes of the quantum grid, or only the starts leaving room for ``duration``."""
+        last = self.end_hour if duration is None else self.end_hour - duration + 1
+        return range(self.start_hour, last, self.time_quantum)
+
+    def course_duration(self, course):
+        """Returns the length in minutes of a course's sessions, ``session_duration`` unless the course sets one."""
+        return course.get('session_duration') or self.session_duration
+
+    def shortest_duration(self):
+        """Returns the length of the shortest sessions, which bounds how many fit in a day."""
+        return min((self.course_duration(course) for course in self.courses), default=self.session_duration)
+
+    def count_sessions(self, course):
+        """Returns the number of sessions needed to cover a course's hourly volume."""
+        return -(-course['hourly_volume'] // self.course_duration(course))
+
     def create_sessions(self):
         """Creates sessions from courses."""
         sessions = []
         for course in self.courses:
-            num_sessions = -(-course['hourly_volume'] // self.session_duration)
+            num_sessions = self.count_sessions(course)
             for session_idx in range(num_sessions):
                 sessions.append((course['id'], session_idx))
         return sessions
 
+    @staticmethod
+    def teacher_key(course):
+        """Identifies a course's teacher, so that courses of several classes share their teacher."""
+        teacher = course['teacher']
+        return teacher.get('id', teacher['name'])
+
+    def compute_domains(self):
+        """Precomputes the feasible start windows of every course on every course day.
+
+        Day boundaries, the subject period and the teacher availability are
+        intersected before any variable exists. Returns ``(domains, stats)``:
+        ``domains[course_id][d]`` lists ``(first, last)`` start minutes on the
+        quantum grid and ``stats`` counts the (session, day, start) candidates
+        pruned by each filter. Courses with the same teacher, period and
+        session duration, e.g. one subject taught to several classes, share a
+        single domain.
+        """
+        slots_per_day = len(self.time_slots())
+        pruned = {"day_bounds": 0, "subject_period": 0, "teacher_availability": 0}
+        candidates = 0
+        domains = {}
+        shared_domains = {}
+
+        for course in self.courses:
+            key = (
+                self.teacher_key(course), course.get('start_date'), course.get('end_date'),
+                self.course_duration(course),
+            )
+            if key not in shared_domains:
+                shared_domains[key] = self.course_domain(course)
+            domain, course_pruned = shared_domains[key]
+
+            num_sessions = self.count_sessions(course)
+            domains[course['id']] = domain
+            candidates += slots_per_day * len(self.course_days) * num_sessions
+            for name, count in course_pruned.items():
+                pruned[name] += count * num_sessions
+
+        stats = {
+            "candidates": candidates,
+            "pruned": pruned,
+            "remaining": candidates - sum(pruned.values()),
+        }
+        return domains, stats
+
+    def course_domain(self, course):
+        """Computes the start windows of one course and how many starts of a session each filter pruned."""
+        q = self.time_quantum
+        duration = self.course_duration(course)
+        slots_per_day = len(self.time_slots())
+        fitting_slots = len(self.time_slots(duration))
+        pruned = {"day_bounds": 0, "subject_period": 0, "teacher_availability": 0}
+        teacher_availability = course['teacher']['availability']
+        domain = {}
+
+        for d, day_index in enumerate(self.course_days):
+            pruned["day_bounds"] += slots_per_day - fitting_slots
+
+            day = self.calendar[day_index]['date']
+            if not within_period(day, course.get('start_date'), course.get('end_date')):
+                pruned["subject_period"] += fitting_slots
+                continue
+
+            windows = []
+            for start_h, end_h in sorted(teacher_availability.get(str(day), [])):
+                first = -(-max(start_h, self.start_hour) // q) * q
+                last = (min(end_h, self.end_hour) - duration) // q * q
+                if first > last:
+                    continue
+                if windows and first <= windows[-1][1] + q:
+                    windows[-1] = (windows[-1][0], max(windows[-1][1], last))
+                else:
+                    windows.append((first, last))
+
+            available_slots = sum((last - first) // q + 1 for first, last in windows)
+            pruned["teacher_availability"] += fitting_slots - available_slots
+            if windows:
+                domain[d] = windows
+        return domain, pruned
+
+    def compile(self, sessions):
+        """Indexes the courses, resources and days of the problem once, before any model is built.
+
+        The constraint generators then look up a session's course, duration
+        and resources, the sessions of each teacher and class and the quanta
+        a start covers in these indexes, so that they run in time linear in
+        the size of the model.
+        """
+        self.course_index = {course['id']: course for course in self.courses}
+        self.durations = {course_id: self.course_duration(course) for course_id, course in self.course_index.items()}
+        # Offsets from a start to every quantum its session covers
+        self.covered_offsets = {
+            course_id: range(0, duration, self.time_quantum) for course_id, duration in self.durations.items()
+        }
+        self.day_dates = [self.calendar[day_index]['date'] for day_index in self.course_days]
+        self.day_index = {str(date): d for d, date in enumerate(self.day_dates)}
+        # Monday of the week of every course day, and the weeks in which each class has courses
+        self.day_weeks = [date - timedelta(days=date.weekday()) for date in self.day_dates]
+        self.class_weeks = {}
+        for course_id in {course_id for course_id, _ in sessions}:
+            course = self.course_index[course_id]
+            if course.get('class_id') is None:
+                continue
+            weeks = self.class_weeks.setdefault(course['class_id'], set())
+            for date, week in zip(self.day_dates, self.day_weeks):
+                if within_period(date, course.get('start_date'), course.get('end_date')):
+                    weeks.add(week)
+
+        # Per room limit, the (d, start_time, end_time) of the bookings of its rooms on course days and how
+        # many of its rooms are never booked then; per booked room, its capacity and bookings
+        self.limit_bookings = {}
+        self.pool_limits = {}
+        self.booked_room_spans = {}
+        for (students, limit), bookings in booked_rooms(self.room_limits, self.room_capacities, self.room_bookings).items():
+            spans = [
+                (booking['classroom_id'], booking['capacity'], self.day_index[str(booking['day'])],
+                 booking['start_time'], booking['end_time'])
+                for booking in bookings if str(booking['day']) in self.day_index
+            ]
+            self.limit_bookings[(students, limit)] = [(d, start, end) for _, _, d, start, end in spans]
+            self.pool_limits[(students, limit)] = limit - len({room_id for room_id, *_ in spans})
+            if (students, limit) == self.room_limits[0]:
+                for room_id, capacity, d, start, end in spans:
+                    self.booked_room_spans.setdefault(room_id, (capacity, []))[1].append((d, start, end))
+
+        self.session_resources = {}
+        resource_index = {}
+        class_teachers = {}
+        for session in sessions:
+            course = self.course_index[session[0]]
+            resources = [("teacher", self.teacher_key(course))]
+            if course.get('class_id') is not None:
+                resources.append(("class", course['class_id']))
+                class_teachers.setdefault(course['class_id'], set()).add(self.teacher_key(course))
+            self.session_resources[session] = resources
+            for resource in resources:
+                resource_index.setdefault(resource, []).append(session)
+        # Classes whose courses all have one teacher are already kept apart by the teacher
+        self.resource_index = {
+            resource: resource_sessions for resource, resource_sessions in resource_index.items()
+            if resource[0] == "teacher" or len(class_teachers[resource[1]]) > 1
+        }
+
     def create_variables(self, sessions):
-        """Creates decision variables."""
+        """Creates decision variables for the feasible starts of each session."""
         x = {}
+        # The (course, day, start) of every literal and its variable index, to decode solutions in bulk
+        self.literal_starts = []
+        literal_indexes = []
         for session in sessions:
             x[session] = {}
-            for d in range(len(self.course_days)):
-                for h in range(self.start_hour, self.end_hour):
-                    var_name = f"x_s{session}_d{d}_h{h}"
-                    x[session][(d, h)] = self.model.NewBoolVar(var_name)
+            for d, windows in self.session_domain(session).items():
+                for first, last in windows:
+                    for h in range(first, last + 1, self.time_quantum):
+                        var_name = f"x_s{session}_d{d}_h{h}"
+                        var = self.model.NewBoolVar(var_name)
+                        x[session][(d, h)] = var
+                        self.literal_starts.append((session[0], d, h))
+                        literal_indexes.append(var.Index())
+        self.literal_indexes = np.array(literal_indexes, dtype=np.int64)
         return x
 
     def add_session_constraints(self, sessions, x):
         """Ensures each session is scheduled exactly once."""
         for session in sessions:
-            valid_slots = []
-            for d in range(len(self.course_days)):
-                for h in range(self.start_hour, self.end_hour - self.session_duration + 1):
-                    valid_slots.append(x[session][(d, h)])
-            self.model.Add(sum(valid_slots) == 1)
-
-    def add_teacher_availability_constraints(self, sessions, x):
-        """Ensures sessions respect teacher availability."""
+            self.model.AddExactlyOne(x[session].values())
+
+    def add_no_overlap_constraints(self, sessions, x):
+        """Prevents overlapping sessions for the same teacher or the same class.
+
+        At most one start literal of a resource's sessions runs during any
+        quantum, each literal being listed under every quantum its session
+        covers, so that sessions of different lengths cannot overlap. Unlike
+        one interval per literal, these cliques keep the model small and its
+        linear relaxation tight.
+        """
+        for resource_sessions in self.resource_index.values():
+            for overlapping_vars in self.running_literals(resource_sessions, x):
+                if len(overlapping_vars) > 1:
+                    self.model.AddAtMostOne(overlapping_vars)
+
+
+    def assign_records(self, records, sessions):
+        """Maps scheduled session records ({"course_id", "day", "start_time"}) to ``(d, h)`` starts of ``sessions``.
+
+        Sessions of a course are interchangeable, so the records of a course are
+        assigned to its sessions in chronological order. Records that are not on
+        a course day or not on the quantum grid are dropped.
+        """
+        course_starts = {}
+        for record in sorted(records, key=lambda record: (str(record['day']), record['start_time'])):
+            d = self.day_index.get(str(record['day']))
+            if d is not None and record['start_time'] % self.time_quantum == 0:
+                course_starts.setdefault(record['course_id'], []).append((d, record['start_time']))
+
+        assigned = {}
+        for session in sessions:
+            course_id, _ = session
+            starts = course_starts.get(course_id)
+            if starts:
+                assigned[session] = starts.pop(0)
+        return assigned
+
+    def session_domain(self, session):
+        """Returns the feasible start windows of a session per course day."""
+        if session in self.pinned:
+            d, h = self.pinned[session]
+            return {d: [(h, h)]}
+        if session in self.refined:
+            return self.refined[session]
+        course_id, _ = session
+        return self.domains[course_id]
+
+    def bucket_windows(self, windows, bucket):
+        """Clips start windows to the morning (0) or afternoon (1) bucket."""
+        q = self.time_quantum
+        if bucket == 0:
+            lower, upper = 0, (MIDDAY - 1) // q * q
+        else:
+            lower, upper = -(-MIDDAY // q) * q, MINUTES_PER_DAY
+        clipped = [(max(first, lower), min(last, upper)) for first, last in windows]
+        return [(first, last) for first, last in clipped if first <= last]
+
+    def fitting_sessions(self, windows, duration=None):
+        """Counts the sessions of ``duration`` minutes that fit one after the other with their starts in ``windows``.
+
+        Defaults to the shortest sessions, which gives an upper bound whatever
+        sessions are held.
+        """
+        duration = duration or self.shortest_duration()
+        count = 0
+        earliest = 0
+        for first, last in windows:
+            h = max(first, -(-earliest // self.time_quantum) * self.time_quantum)
+            while h <= last:
+                count += 1
+                earliest = h + duration
+                h = -(-earliest // self.time_quantum) * self.time_quantum
+        return count
+
+    def solve_coarse(self, sessions):
+        """Picks a day and half-day bucket for every session and restricts its starts to it.
+
+        The coarse model bounds the sessions of a teacher per bucket and per day
+        by how many fit in their availability, and the sessions of all teachers
+        per bucket by how many fit in the rooms. Returns the refined domains,
+        empty when the coarse model has no solution, and the stage statistics.
+        """
+        model = cp_model.CpModel()
+        day_slots = [(self.start_hour, self.end_hour - self.shortest_duration())]
+        room_capacity = {bucket: self.fitting_sessions(self.bucket_windows(day_slots, bucket)) for bucket in (0, 1)}
+
+        y = {}
+        teacher_buckets = {}
+        teacher_days = {}
+        buckets = {}
         for session in sessions:
             course_id, _ = session
-            course = next(c for c in self.courses if c['id'] == course_id)
-            teacher_availability = course['teacher']['availability']
-
-            for d in range(len(self.course_days)):
-                day_index = self.course_days[d]
-                day_date = str(self.calendar[day_index]['date'])
-                intervals = teacher_availability.get(day_date, [])
-                for h in range(self.start_hour, self.end_hour):
-                    var = x[session][(d, h)]
-                    if h + self.session_duration > self.end_hour:
-                        self.model.Add(var == 0)
+            teacher = self.session_resources[session][0]
+            duration = self.durations[course_id]
+            y[session] = {}
+            for d, windows in self.session_domain(session).items():
+                day_capacity = self.fitting_sessions(windows, duration)
+                teacher_days.setdefault((teacher, d), [[], 0])
+                teacher_days[(teacher, d)][1] = max(teacher_days[(teacher, d)][1], day_capacity)
+                for bucket in (0, 1):
+                    capacity = self.fitting_sessions(self.bucket_windows(windows, bucket), duration)
+                    if not capacity:
                         continue
+                    var = model.NewBoolVar(f"y_s{session}_d{d}_b{bucket}")
+                    y[session][(d, bucket)] = var
+                    entry = teacher_buckets.setdefault((teacher, d, bucket), [[], 0])
+                    entry[0].append(var)
+                    entry[1] = max(entry[1], capacity)
+                    teacher_days[(teacher, d)][0].append(var)
+                    buckets.setdefault((d, bucket), []).append(var)
 
-                    is_valid = any(start_h <= h and h + self.session_duration <= end_h for start_h, end_h in intervals)
-                    if not is_valid:
-                        self.model.Add(var == 0)
+        for session in sessions:
+            model.AddExactlyOne(y[session].values())
+        for variables, capacity in list(teacher_buckets.values()) + list(teacher_days.values()):
+            if len(variables) > capacity:
+                model.Add(sum(variables) <= capacity)
+        for (d, bucket), variables in buckets.items():
+            if len(variables) > self.nb_rooms * room_capacity[bucket]:
+                model.Add(sum(variables) <= self.nb_rooms * room_capacity[bucket])
+        # Interchangeable sessions take their buckets in order, like their starts in the refinement
+        for course_sessions in self.free_sessions_by_course(sessions).values():
+            positions = [sum(var * (2 * d + bucket) for (d, bucket), var in y[session].items())
+                         for session in course_sessions]
+            for earlier, later in zip(positions, positions[1:]):
+                model.Add(earlier <= later)
+        for session, (d, h) in self.match_hints(sessions).items():
+            model.AddHint(y[session][(d, 0 if h < MIDDAY else 1)], 1)
 
-    def add_no_overlap_constraints(self, sessions, x):
-        """Prevents overlapping sessions for the same teacher."""
-        teacher_to_sessions = {}
+        # The refinement, and the full model if it fails, get the rest of the budget
+        solver = self.create_solver(share=0.25)
+        status = solver.Solve(model)
+        stats = {"status": solver.StatusName(status), "variables": sum(len(buckets) for buckets in y.values())}
+        if status not in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
+            return {}, stats
+
+        refined = {}
+        values = self.solution_values(solver)
+        for session in sessions:
+            if session in self.pinned:
+                continue
+            for (d, bucket), var in y[session].items():
+                if values[var.Index()]:
+                    refined[session] = {d: self.bucket_windows(self.session_domain(session)[d], bucket)}
+        return refined, stats
+
+    def free_sessions_by_course(self, sessions):
+        """Groups the sessions that are not pinned by course, in index order."""
+        by_course = {}
+        for session in sessions:
+            if session not in self.pinned:
+                by_course.setdefault(session[0], []).append(session)
+        return by_course
+
+    def session_position(self, x, session):
+        """Returns the start of a session on the global time axis, in minutes."""
+        starts = x[session]
+        return cp_model.LinearExpr.WeightedSum(list(starts.values()), [d * MINUTES_PER_DAY + h for d, h in starts])
+
+    def day_presences(self, x, session):
+        """Returns, per course day, an expression equal to 1 when the session takes place that day."""
+        presences = {}
+        for (d, h), var in x[session].items():
+            presences.setdefault(d, []).append(var)
+        return {d: cp_model.LinearExpr.Sum(variables) for d, variables in presences.items()}
+
+    def add_symmetry_breaking_constraints(self, sessions, x):
+        """Orders the starts of the interchangeable sessions of each course.
+
+        Sessions of a course share their teacher, so each starts at least one
+        session duration after the previous one. Pinned sessions keep their
+        slot and are left out.
+        """
+        for course_id, course_sessions in self.free_sessions_by_course(sessions).items():
+            duration = self.durations[course_id]
+            positions = [self.session_position(x, session) for session in course_sessions]
+            for earlier, later in zip(positions, positions[1:]):
+                self.model.Add(later >= earlier + duration)
+
+    def add_capacity_constraints(self, sessions, x):
+        """Adds redundant bounds on the sessions held per day, which tighten the relaxation.
+
+        A teacher holds at most as many sessions a day as fit back to back in
+        their availability, a class and the rooms at most as many as fit in a
+        school day. Teacher and class days with pinned sessions, which may lie
+        outside the availability, are left out.
+        """
+        room_capacity = self.nb_rooms * self.fitting_sessions(
+            [(self.start_hour, self.end_hour - self.shortest_duration())]
+        )
+        # Per (teacher or class, day): the presences and how many sessions fit that day
+        resource_days = {}
+        room_days = {}
+        pinned_days = {
+            (resource, d) for session, (d, _) in self.pinned.items() for resource in self.session_resources[session]
+        }
         for session in sessions:
             course_id, _ = session
-            course = next(c for c in self.courses if c['id'] == course_id)
-            teacher_name = course['teacher']['name']
-            teacher_to_sessions.setdefault(teacher_name, []).append(session)
+            duration = self.durations[course_id]
+            for d, presence in self.day_presences(x, session).items():
+                room_days.setdefault(d, []).append(presence)
+                for resource in self.session_resources[session]:
+                    if (resource, d) in pinned_days:
+                        continue
+                    windows = self.domains[course_id].get(d, []) if resource[0] == "teacher" else [
+                        (self.start_hour, self.end_hour - duration)
+                    ]
+                    entry = resource_days.setdefault((resource, d), [[], 0])
+                    entry[0].append(presence)
+                    entry[1] = max(entry[1], self.fitting_sessions(windows, duration))
+
+        for presences, capacity in resource_days.values():
+            if len(presences) > capacity:
+                self.model.Add(cp_model.LinearExpr.Sum(presences) <= capacity)
+        for presences in room_days.values():
+            if len(presences) > room_capacity:
+                self.model.Add(cp_model.LinearExpr.Sum(presences) <= room_capacity)
+
+    def preferred_start(self, h, duration):
+        """Tells whether a session of ``duration`` minutes starting at ``h`` lies within a preferred time window."""
+        return not self.preferred_windows or any(
+            first <= h and h + duration <= last for first, last in self.preferred_windows
+        )
+
+    def optimizes(self):
+        """Tells whether the soft constraints are added to the model.
+
+        They are left out when none is weighed, and when the search stops at
+        its first solution or gets less than ``objective_min_time`` seconds:
+        the objective would then only slow down finding a timetable. Given,
+        ``optimize`` replaces the time check.
+        """
+        if not any(self.objective_weights.values()) or self.parameters.get("stop_after_first_solution"):
+            return False
+        if self.optimize is not None:
+            return self.optimize
+        return self.time_limit is None or self.time_limit >= self.objective_min_time
+
+    def day_starts(self, x, session):
+        """Returns, per course day, the literal set when the session takes place that day and its start minute then."""
+        by_day = {}
+        for (d, h), var in x[session].items():
+            variables, hours = by_day.setdefault(d, ([], []))
+            variables.append(var)
+            hours.append(h)
+
+        starts = {}
+        for d, (variables, hours) in by_day.items():
+            if len(variables) == 1:
+                starts[d] = (variables[0], hours[0])
+                continue
+            presence = self.model.NewBoolVar(f"present_s{session}_d{d}")
+            minute = self.model.NewIntVar(min(hours), max(hours), f"minute_s{session}_d{d}")
+            self.model.Add(cp_model.LinearExpr.Sum(variables) == presence)
+            self.model.Add(minute == cp_model.LinearExpr.WeightedSum(variables, hours)).OnlyEnforceIf(presence)
+            starts[d] = (presence, minute)
+            self.start_variables[(session, d)] = (presence, minute)
+        return starts
+
+    def idle_time(self, sessions, starts, kind):
+        """Returns an expression of the idle minutes of the ``kind`` resources, teachers or classes, summed over their days.
+
+        Each resource day gets a first and a last minute bounding the sessions
+        held that day; the minutes between them not spent in session are idle.
+        The model thus grows with the sessions, not with their pairs. As the
+        bounds are only pushed by the sessions, a redundant constraint keeps
+        each day at least as long as its sessions, so that the idle time is
+        provably non-negative and the search can close its gap.
+        """
+        bounds = self.resource_bounds
+        # Per resource day, the presences and durations of the sessions that may be held that day
+        day_sessions = {}
+        busy = 0
+        for session in sessions:
+            duration = self.durations[session[0]]
+            for resource in self.session_resources[session]:
+                if resource[0] != kind:
+                    continue
+                busy += duration
+                for d, (presence, minute) in starts[session].items():
+                    if (resource, d) not in bounds:
+                        first = self.model.NewIntVar(self.start_hour, self.end_hour, f"first_{kind}{resource[1]}_d{d}")
+                        last = self.model.NewIntVar(self.start_hour, self.end_hour, f"last_{kind}{resource[1]}_d{d}")
+                        self.model.Add(first <= last)
+                        bounds[(resource, d)] = (first, last)
+                    first, last = bounds[(resource, d)]
+                    self.model.Add(first <= minute).OnlyEnforceIf(presence)
+                    self.model.Add(last >= minute + duration).OnlyEnforceIf(presence)
+                    presences, durations = day_sessions.setdefault((resource, d), ([], []))
+                    presences.append(presence)
+                    durations.append(duration)
+        for key, (presences, durations) in day_sessions.items():
+            first, last = bounds[key]
+            self.model.Add(last - first >= cp_model.LinearExpr.WeightedSum(presences, durations))
+        firsts = [first for (resource, _), (first, _) in bounds.items() if resource[0] == kind]
+        lasts = [last for (resource, _), (_, last) in bounds.items() if resource[0] == kind]
+        return cp_model.LinearExpr.Sum(lasts) - cp_model.LinearExpr.Sum(firsts) - busy
+
+    def weekly_spread(self, sessions, starts):
+        """Returns an expression of the minutes between the busiest and the quietest week of every class."""
+        loads = {}
+        for session in sessions:
+            duration = self.durations[session[0]]
+            for kind, class_id in self.session_resources[session]:
+                if kind != "class":
+                    continue
+                for d, (presence, _) in starts[session].items():
+                    presences, durations = loads.setdefault((class_id, self.day_weeks[d]), ([], []))
+                    presences.append(presence)
+                    durations.append(duration)
+
+        spreads = []
+        for class_id, weeks in self.class_weeks.items():
+            if len(weeks) < 2:
+                continue
+            week_loads = [cp_model.LinearExpr.WeightedSum(*loads.get((class_id, week), ([], []))) for week in weeks]
+            busiest = self.model.NewIntVar(0, 7 * MINUTES_PER_DAY, f"busiest_week_class{class_id}")
+            quietest = self.model.NewIntVar(0, 7 * MINUTES_PER_DAY, f"quietest_week_class{class_id}")
+            for load in week_loads:
+                self.model.Add(busiest >= load)
+                self.model.Add(quietest <= load)
+            self.week_bounds[class_id] = (busiest, quietest)
+            spreads.append(busiest - quietest)
+        return cp_model.LinearExpr.Sum(spreads)
+
+    def outside_preferred_windows(self, sessions, x):
+        """Returns an expression counting the sessions held outside the preferred time windows."""
+        return cp_model.LinearExpr.Sum([
+            var for session in sessions for (d, h), var in x[session].items()
+            if not self.preferred_start(h, self.durations[session[0]])
+        ])
+
+    def add_objective(self, sessions, x):
+        """Minimizes the weighted soft constraints.
+
+        Idle time and weekly loads are measured on a few aggregates per
+        resource and day, and the preferred windows on the start literals, so
+        the objective stays linear in the size of the model. Its value equals
+        ``objective_cost`` of the timetable once the search proves it optimal.
+        """
+        weights = self.objective_weights
+        self.start_variables, self.preferred_literals, self.resource_bounds, self.week_bounds = {}, {}, {}, {}
+        starts = {}
+        if weights["teacher_gaps"] or weights["class_spread"] or weights["weekly_load"]:
+            starts = {session: self.day_starts(x, session) for session in sessions}
+
+        terms = []
+        if weights["teacher_gaps"]:
+            terms.append(weights["teacher_gaps"] * self.idle_time(sessions, starts, "teacher"))
+        if weights["class_spread"]:
+            terms.append(weights["class_spread"] * self.idle_time(sessions, starts, "class"))
+        if weights["weekly_load"]:
+            terms.append(weights["weekly_load"] * self.weekly_spread(sessions, starts))
+        if weights["preferred_windows"] and self.preferred_windows:
+            terms.append(weights["preferred_windows"] * self.outside_preferred_windows(sessions, x))
+        if terms:
+            self.model.Minimize(cp_model.LinearExpr.Sum(terms))
+
+    def add_objective_hints(self, matched):
+        """Hints the objective variables with their values in the hinted timetable, so that the search starts from it."""
+        placed = {**self.pinned, **matched}
+        for (session, d), (presence, minute) in self.start_variables.items():
+            if session in placed:
+                self.model.AddHint(presence, placed[session][0] == d)
+                if placed[session][0] == d:
+                    self.model.AddHint(minute, placed[session][1])
+        for (session, d), literal in self.preferred_literals.items():
+            if session in placed:
+                start = placed[session]
+                self.model.AddHint(literal, start[0] == d and self.preferred_start(start[1], self.durations[session[0]]))
+
+        spans = {}
+        week_loads = {}
+        for session, (d, h) in placed.items():
+            duration = self.durations[session[0]]
+            for resource in self.session_resources[session]:
+                first, last = spans.get((resource, d), (h, h + duration))
+                spans[(resource, d)] = (min(first, h), max(last, h + duration))
+                if resource[0] == "class":
+                    week = (resource[1], self.day_weeks[d])
+                    week_loads[week] = week_loads.get(week, 0) + duration
+        for key, (first, last) in self.resource_bounds.items():
+            if key in spans:
+                self.model.AddHint(first, spans[key][0])
+                self.model.AddHint(last, spans[key][1])
+        for class_id, (busiest, quietest) in self.week_bounds.items():
+            loads = [week_loads.get((class_id, week), 0) for week in self.class_weeks[class_id]]
+            self.model.AddHint(busiest, max(loads))
+            self.model.AddHint(quietest, min(loads))
+
+    def objective_terms(self, schedule):
+        """Measures every soft constraint on a schedule, in the units they are weighed in."""
+        terms = dict.fromkeys(OBJECTIVE_WEIGHTS, 0)
+        resource_days = {}
+        week_loads = {}
+        for record in schedule:
+            course = self.course_index[record['course_id']]
+            duration = record['end_time'] - record['start_time']
+            resources = [("teacher_gaps", self.teacher_key(course))]
+            if course.get('class_id') is not None:
+                resources.append(("class_spread", course['class_id']))
+                week = (course['class_id'], record['day'] - timedelta(days=record['day'].weekday()))
+                week_loads[week] = week_loads.get(week, 0) + duration
+            for resource in resources:
+                resource_days.setdefault((resource, record['day']), []).append((record['start_time'], record['end_time']))
+            if not self.preferred_start(record['start_time'], duration):
+                terms["preferred_windows"] += 1
 
-        for teacher, teacher_sessions in teacher_to_sessions.items():
-            for d in range(len(self.course_days)):
-                for h in range(self.start_hour, self.end_hour):
-                    vars_at_time = [x[session][(d, h)] for session in teacher_sessions]
-                    self.model.Add(sum(vars_at_time) <= 1)
+        for ((term, _), _), spans in resource_days.items():
+            busy = sum(end - start for start, end in spans)
+            terms[term] += max(end for _, end in spans) - min(start for start, _ in spans) - busy
+        for class_id, weeks in self.class_weeks.items():
+            loads = [week_loads.get((class_id, week), 0) for week in weeks]
+            terms["weekly_load"] += max(loads) - min(loads)
+        return terms
 
+    def objective_cost(self, terms):
+        """Weighs the measured soft constraints of a schedule into its cost."""
+        return sum(self.objective_weights[name] * value for name, value in terms.items())
+
+    def match_hints(self, sessions):
+        """Maps each hinted session to the ``(d, h)`` start it had in the previous schedule.
+
+        Hints that no longer fall on a feasible start are dropped.
+        """
+        free_sessions = [session for session in sessions if session not in self.pinned]
+        matched = {}
+        for session, (d, h) in self.assign_records(self.hints, free_sessions).items():
+            if any(first <= h <= last and (h - first) % self.time_quantum == 0
+                   for first, last in self.session_domain(session).get(d, [])):
+                matched[session] = (d, h)
+        return matched
+
+    def add_hints(self, sessions, x):
+        """Feeds the previous schedule to the solver as a starting point."""
+        matched = self.match_hints(sessions)
+        # Only the chosen literals are hinted: zero hints on every other start slow the presolve down
+        for session, start in matched.items():
+            self.model.AddHint(x[session][start], 1)
+        self.add_objective_hints(matched)
+        return {"given": len(self.hints), "matched": len(matched)}
+
+    def running_literals(self, sessions, x):
+        """Lists, for each quantum of each course day, the start literals of the sessions running during it.
+
+        Every literal is listed under the quanta its session covers, so that
+        courses of any duration share the same per-quantum bounds.
+        """
+        q = self.time_quantum
+        n_cells = (MINUTES_PER_DAY - self.start_hour) // q
+        running = [[[] for _ in range(n_cells)] for _ in self.course_days]
+        for session in sessions:
+            length = len(self.covered_offsets[session[0]])
+            for (d, h), var in x[session].items():
+                i = (h - self.start_hour) // q
+                for cell in running[d][i:i + length]:
+                    cell.append(var)
+        return [cell for day in running for cell in day]
+
+    def room_groups(self, sessions):
+        """Returns each room limit with the sessions it bounds and the bookings of its rooms.
+
+        Limits that the sessions cannot reach, having fewer teachers or classes
+        than free rooms, are left out.
+        """
+        groups = []
+        for students, limit in self.room_limits:
+            group = [session for session in sessions if (self.course_index[session[0]].get('students') or 0) >= students]
+            resources = {resource for session in group for resource in self.session_resources[session]}
+            concurrency = sum(1 for kind, _ in resources if kind == "teacher")
+            if all(len(self.session_resources[session]) > 1 for session in group):
+                concurrency = min(concurrency, sum(1 for kind, _ in resources if kind == "class"))
+            booked = self.limit_bookings[(students, limit)]
+            if concurrency > limit - peak_bookings(booked):
+                groups.append((group, limit, booked))
+        return groups
+
+    def booked_cells(self, booked, n_cells):
+        """Counts, per course day and quantum from ``start_hour``, the ``booked`` rooms held during it."""
+        q = self.time_quantum
+        counts = np.zeros((len(self.course_days), n_cells), dtype=np.int32)
+        for d, start, end in booked:
+            first = max(0, (start - self.start_hour) // q)
+            last = max(0, min(n_cells, -(-(end - self.start_hour) // q)))
+            counts[d, first:last] += 1
+        return counts
 
     def add_room_constraints(self, sessions, x):
-        """Ensures the number of sessions does not exceed room availability."""
-        for d in range(len(self.course_days)):
-            for t in range(self.start_hour, self.end_hour):
-                overlapping_vars = []
-                for session in sessions:
-                    for h in range(self.start_hour, self.end_hour - self.session_duration + 1):
-                        if h <= t < h + self.session_duration:
-                            overlapping_vars.append(x[session][(d, h)])
-                self.model.Add(sum(overlapping_vars) <= self.nb_rooms)
-
-    def solve(self):
-        """Solves the model and returns the schedule."""
+        """Ensures the number of sessions does not exceed the rooms left free by other schedules."""
+        n_cells = (MINUTES_PER_DAY - self.start_hour) // self.time_quantum
+        for group, limit, booked in self.room_groups(sessions):
+            held = self.booked_cells(booked, n_cells).ravel()
+            for overlapping_vars, cell_held in zip(self.running_literals(group, x), held):
+                free = max(0, limit - int(cell_held))
+                if len(overlapping_vars) > free:
+                    self.model.Add(cp_model.LinearExpr.Sum(overlapping_vars) <= free)
+
+    def position_variable(self, x, session):
+        """Returns a variable equal to the start of a session on the global time axis, in minutes."""
+        position = self.model.NewIntVar(0, len(self.course_days) * MINUTES_PER_DAY, f"position_s{session}")
+        self.model.Add(position == self.session_position(x, session))
+        return position
+
+    def add_booked_room_constraints(self, sessions, x):
+        """Gives a room to the sessions when other schedules book some of the rooms.
+
+        Counting the rooms left free at each instant lets a session run from
+        one room into another as their bookings change hands, so each booked
+        room is chosen explicitly: a session either takes a booked room large
+        enough, kept apart from its bookings and from the other sessions in
+        it, or one of the rooms never booked, which being always free and
+        nested by size can be matched to the sessions by counting.
+        """
+        if not self.booked_room_spans:
+            return
+        room_intervals = {room_id: [] for room_id in self.booked_room_spans}
+        pool_intervals = {pair: [] for pair in self.room_limits}
+        for session in sessions:
+            students = self.course_index[session[0]].get('students') or 0
+            duration = self.durations[session[0]]
+            position = self.position_variable(x, session)
+            pooled = self.model.NewBoolVar(f"pooled_s{session}")
+            choices = [pooled]
+            for room_id, (capacity, _) in self.booked_room_spans.items():
+                if self.room_capacities and capacity < students:
+                    continue
+                var = self.model.NewBoolVar(f"room{room_id}_s{session}")
+                room_intervals[room_id].append(self.model.NewOptionalFixedSizeIntervalVar(position, duration, var, ""))
+                choices.append(var)
+            self.model.AddExactlyOne(choices)
+            for pair in self.room_limits:
+                if students >= pair[0]:
+                    pool_intervals[pair].append(self.model.NewOptionalFixedSizeIntervalVar(position, duration, pooled, ""))
+
+        for room_id, (_, spans) in self.booked_room_spans.items():
+            self.model.AddNoOverlap(room_intervals[room_id] + [
+                self.model.NewFixedSizeIntervalVar(d * MINUTES_PER_DAY + start, end - start, "") for d, start, end in spans
+            ])
+        for pair, intervals in pool_intervals.items():
+            self.model.AddCumulative(intervals, [1] * len(intervals), max(0, self.pool_limits[pair]))
+
+    def create_solver(self, share=1.0):
+        """Creates a solver with the configured parameters, limited to ``share`` of the time left."""
+        solver = cp_model.CpSolver()
+        for name, value in self.parameters.items():
+            setattr(solver.parameters, name, value)
+        if self.deadline is not None:
+            solver.parameters.max_time_in_seconds = max(0.0, (self.deadline - time.monotonic()) * share)
+        self.solver = solver
+        return solver
+
+    def stop(self):
+        """Asks the running search, if any, to stop and return its best solution so far."""
+        self.stopped = True
+        if self.solver is not None:
+            self.solver.StopSearch()
+
+    def solve(self, progress=None):
+        """Solves the model and returns the schedule.
+
+        ``progress`` is called with the elapsed time, objective, best bound and
+        number of solutions found each time the search finds a solution. Large
+        instances are solved in two stages: a half-day model picks each
+        session's bucket, then exact starts are searched within the buckets
+        only, falling back to the full model if the refinement fails. With a
+        ``time_limit``, the best solution found when it runs out is returned.
+        ``total_cost`` weighs the soft constraints measured on the timetable.
+        Infeasible results list the ``conflicts`` explaining them.
+        """
+        if self.time_limit is not None:
+            self.deadline = time.monotonic() + self.time_limit
         sessions = self.create_sessions()
+        started = time.perf_counter()
+        self.compile(sessions)
+        self.domains, domain_stats = self.compute_domains()
+        self.pinned = self.assign_records(self.fixed_sessions, sessions)
+        stats = {"domains": domain_stats, "pinned": len(self.pinned), "build_time": time.perf_counter() - started}
+
+        if self.coarse_threshold and domain_stats["remaining"] > self.coarse_threshold:
+            self.refined, stats["coarse"] = self.solve_coarse(sessions)
+        result = self.solve_model(sessions, stats, progress)
+
+        if self.refined and "sessions" not in result and not self.stopped:
+            self.refined = {}
+            self.model = cp_model.CpModel()
+            stats["coarse"]["fallback"] = True
+            result = self.solve_model(sessions, stats, progress)
+
+        if result["status"] == "INFEASIBLE" and not self.stopped:
+            # Imported here as the explainer builds on this module
+            from src.libraries.ortools.infeasibility import InfeasibilityExplainer
+            result["conflicts"] = InfeasibilityExplainer(self).explain(sessions)
+        return result
+
+    def solve_model(self, sessions, stats, progress=None):
+        """Builds the model over the current session domains and solves it.
+
+        The time spent building the model is added to the ``build_time`` of
+        ``stats``, apart from the search time.
+        """
+        started = time.perf_counter()
         x = self.create_variables(sessions)
 
         # Add constraints
         self.add_session_constraints(sessions, x)
-        self.add_teacher_availability_constraints(sessions, x)
         self.add_no_overlap_constraints(sessions, x)
         self.add_room_constraints(sessions, x)
+        self.add_booked_room_constraints(sessions, x)
+        self.add_symmetry_breaking_constraints(sessions, x)
+        self.add_capacity_constraints(sessions, x)
+        stats["optimized"] = self.optimizes()
+        if stats["optimized"]:
+            self.add_objective(sessions, x)
+        if self.hints:
+            stats["hints"] = self.add_hints(sessions, x)
+        stats["build_time"] = stats.get("build_time", 0) + time.perf_counter() - started
 
         # Solve the model
-        solver = cp_model.CpSolver()
-        status = solver.Solve(self.model)
+        if self.stopped:
+            return {"status": "UNKNOWN", "stats": stats}
+        solver = self.create_solver()
+        callback = ProgressCallback(progress) if progress else None
+        status = solver.Solve(self.model, callback)
 
         if status in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
-            schedule = []
-            for session in sessions:
-                course_id, session_idx = session
-                course = next(c for c in self.courses if c['id'] == course_id)
-
-                for d in range(len(self.course_days)):
-                    for h in range(self.start_hour, self.end_hour):
-                        if solver.Value(x[session][(d, h)]) == 1:
-                            day_index = self.course_days[d]
-                            date = self.calendar[day_index]['date']
-                            schedule.append({
-                                "course_id": course_id,
-                                "course": course['name'],
-                                "day": date,
-                                "start_time": h,
-                                "end_time": h + self.session_duration,
-                                "teacher": course['teacher']['name'],
-                            })
+            started = time.perf_counter()
+            schedule = self.extract_schedule(solver, sessions, x)
+            stats["extract_time"] = time.perf_counter() - started
+            stats["objective_terms"] = self.objective_terms(schedule)
             return {
                 "status": solver.StatusName(status),
                 "sessions": schedule,
-                "total_cost": solver.ObjectiveValue(),
+                "total_cost": self.objective_cost(stats["objective_terms"]),
+                "stats": stats,
             }
         else:
-            return {"status": solver.StatusName(status)}
+            return {"status": solver.StatusName(status), "stats": stats}
+
+    def schedule_record(self, course, d, start_time):
+        """Builds the record of a session of ``course`` starting at ``start_time`` on course day ``d``."""
+        return {
+            "course_id": course['id'],
+            "course": course['name'],
+            "day": self.day_dates[d],
+            "start_time": start_time,
+            "end_time": start_time + self.durations[course['id']],
+            "teacher": course['teacher']['name'],
+            "class_id": course.get('class_id'),
+        }
+
+    @staticmethod
+    def solution_values(solver):
+        """Fetches the values of all the model variables in one call, indexed like the variables."""
+        return np.array(solver.ResponseProto().solution, dtype=np.int64)
+
+    def extract_schedule(self, solver, sessions, x):
+        """Reads the scheduled sessions back from a solved model.
+
+        The values of all the variables are fetched at once and only the start
+        literal set for each session is decoded.
+        """
+        active = np.flatnonzero(self.solution_values(solver)[self.literal_indexes])
+        return [
+            self.schedule_record(self.course_index[course_id], d, h)
+            for course_id, d, h in (self.literal_starts[i] for i in active)
+        ]
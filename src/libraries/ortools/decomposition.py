@@ -0,0 +1,294 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from src.libraries.ortools.combinator import Combinator, booked_rooms, peak_bookings, room_limits
+from src.libraries.ortools.greedy_combinator import GreedyCombinator
+
+
+def conflict_components(courses, nb_rooms, room_capacities=None, room_bookings=None):
+    """Splits courses into groups that share no teacher, class or binding room pool.
+
+    Courses are linked when they have the same teacher or the same class. The
+    room pool links every course only when it can bind, i.e. when the
+    components could together run more sessions at once than there are rooms
+    left free by ``room_bookings``, or than there are free rooms large enough
+    for the classes of some size; a teacher and a class attend one session at
+    a time, so a component never runs more sessions at once than it has
+    teachers, or classes.
+    """
+    parents = list(range(len(courses)))
+
+    def find(i):
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    owners = {}
+    for i, course in enumerate(courses):
+        resources = [("teacher", Combinator.teacher_key(course))]
+        if course.get('class_id') is not None:
+            resources.append(("class", course['class_id']))
+        for resource in resources:
+            if resource in owners:
+                parents[find(i)] = find(owners[resource])
+            else:
+                owners[resource] = i
+
+    groups = {}
+    for i, course in enumerate(courses):
+        groups.setdefault(find(i), []).append(course)
+    components = list(groups.values())
+
+    def concurrency(component):
+        teachers = {Combinator.teacher_key(course) for course in component}
+        if any(course.get('class_id') is None for course in component):
+            return len(teachers)
+        return min(len(teachers), len({course['class_id'] for course in component}))
+
+    limits = room_limits(courses, nb_rooms, room_capacities)
+    booked = booked_rooms(limits, room_capacities, room_bookings)
+    for students, limit in limits:
+        large = [
+            [course for course in component if (course.get('students') or 0) >= students] for component in components
+        ]
+        spans = [(booking['day'], booking['start_time'], booking['end_time']) for booking in booked[(students, limit)]]
+        if sum(concurrency(component) for component in large) > limit - peak_bookings(spans):
+            return [courses]
+    return components
+
+
+def horizon_windows(calendar, horizon_weeks):
+    """Groups the calendar days into windows of ``horizon_weeks`` consecutive weeks, starting on Mondays."""
+    first_monday = min(day['date'] for day in calendar)
+    first_monday -= timedelta(days=first_monday.weekday())
+    windows = {}
+    for day in calendar:
+        window = (day['date'] - first_monday).days // (7 * horizon_weeks)
+        windows.setdefault(window, []).append(day)
+    return [windows[window] for window in sorted(windows)]
+
+
+def split_sessions(total, weights, minimums):
+    """Splits ``total`` sessions over windows proportionally to ``weights``, each window getting at least its minimum.
+
+    The remainder of the proportional split goes to the windows with the
+    largest fractional parts, so the counts always add up to ``total``.
+    """
+    counts = list(minimums)
+    remaining = total - sum(counts)
+    if remaining <= 0:
+        return counts
+    if not sum(weights):
+        counts[0] += remaining
+        return counts
+
+    shares = [remaining * weight / sum(weights) for weight in weights]
+    for i, share in enumerate(shares):
+        counts[i] += int(share)
+    leftover = remaining - sum(int(share) for share in shares)
+    by_fraction = sorted(range(len(shares)), key=lambda i: int(shares[i]) - shares[i])
+    for i in by_fraction[:leftover]:
+        counts[i] += 1
+    return counts
+
+
+class DecomposedSolver:
+    """Solves the independent subproblems of a scheduling problem concurrently.
+
+    The courses are split into the components of their conflict graph and,
+    when ``horizon_weeks`` is set, the calendar into windows of that many
+    weeks: a course's sessions are spread over the windows according to how
+    many fit in its subject period and teacher availability in each of them.
+    Should a window still fail, the components are solved over the whole
+    calendar instead. Each subproblem is solved by its own ``engine_class``
+    instance and the results are merged into the output of
+    ``Combinator.solve()``. CP-SAT releases the GIL while searching, so the
+    subproblems are solved on separate cores. With ``greedy_hints``,
+    subproblems without hints start from a greedy timetable. ``time_limit``
+    bounds the whole solve: each subproblem gets its share of the time left,
+    split evenly between the rounds of subproblems still waiting for a core,
+    so that optimizing ones do not starve the others. Whether the subproblems
+    minimize the soft constraints is decided once, from the whole budget.
+    """
+
+    def __init__(self, engine_class, arguments, horizon_weeks=0, greedy_hints=False, time_limit=None):
+        self.engine_class = engine_class
+        self.arguments = arguments
+        self.horizon_weeks = horizon_weeks
+        self.greedy_hints = greedy_hints
+        self.time_limit = time_limit
+        self.deadline = None
+        self.optimize = Combinator(**{**arguments, "time_limit": time_limit}).optimizes()
+        # Subproblems not started yet and how many are solved at once, to share the time left
+        self.waiting = 1
+        self.concurrency = 1
+        self.lock = threading.Lock()
+
+    def restrict_records(self, arguments, courses, days=None):
+        """Restricts the hints and fixed sessions of ``arguments`` to ``courses``, and to ``days`` when given."""
+        course_ids = {course['id'] for course in courses}
+        for name in ("hints", "fixed_sessions"):
+            if arguments.get(name):
+                arguments[name] = [
+                    record for record in arguments[name]
+                    if record['course_id'] in course_ids and (days is None or str(record['day']) in days)
+                ]
+        return arguments
+
+    def component_arguments(self, courses):
+        """Restricts the engine arguments, hints and fixed sessions included, to ``courses``."""
+        return self.restrict_records({**self.arguments, "courses": courses}, courses)
+
+    def window_arguments(self, arguments):
+        """Splits the arguments of a component into one set of arguments per horizon window."""
+        windows = horizon_windows(arguments["calendar"], self.horizon_weeks)
+        if len(windows) == 1:
+            return [arguments]
+
+        window_days = [{str(day['date']) for day in window} for window in windows]
+        date_windows = {str(day['date']): i for i, window in enumerate(windows) for day in window}
+        # Sessions are spread by how many fit in the course's subject period and teacher availability
+        combinator = Combinator(**arguments)
+        domains, _ = combinator.compute_domains()
+        window_volumes = {}
+        for course in arguments["courses"]:
+            duration = combinator.course_duration(course)
+            capacities = [0] * len(windows)
+            for d, day_windows in domains[course['id']].items():
+                date = combinator.calendar[combinator.course_days[d]]['date']
+                capacities[date_windows[str(date)]] += combinator.fitting_sessions(day_windows, duration)
+            fixed = [
+                sum(
+                    1 for record in arguments.get("fixed_sessions") or []
+                    if record['course_id'] == course['id'] and str(record['day']) in days
+                )
+                for days in window_days
+            ]
+            window_volumes[course['id']] = [
+                count * duration for count in split_sessions(combinator.count_sessions(course), capacities, fixed)
+            ]
+
+        subproblems = []
+        for i, window in enumerate(windows):
+            courses = [
+                {**course, "hourly_volume": window_volumes[course['id']][i]}
+                for course in arguments["courses"]
+                if window_volumes[course['id']][i]
+            ]
+            if courses:
+                subproblems.append(self.restrict_records(
+                    {**arguments, "calendar": window, "courses": courses}, courses, window_days[i]
+                ))
+        return subproblems
+
+    def subproblems(self, windowed=True):
+        """Returns the engine arguments of every independent subproblem, split into horizon windows unless told not to."""
+        components = conflict_components(
+            self.arguments["courses"], self.arguments["nb_rooms"], self.arguments.get("room_capacities"),
+            self.arguments.get("room_bookings"),
+        )
+        if len(components) == 1:
+            subproblems = [self.arguments]
+        else:
+            subproblems = [self.component_arguments(courses) for courses in components]
+        if self.horizon_weeks and windowed:
+            subproblems = [windowed for arguments in subproblems for windowed in self.window_arguments(arguments)]
+        return subproblems
+
+    def solve(self, progress=None):
+        """Solves every subproblem and merges their schedules.
+
+        ``progress`` receives the summed objective and bound of the subproblems
+        each time one of them finds a solution.
+        """
+        if self.time_limit is not None:
+            self.deadline = time.monotonic() + self.time_limit
+        subproblems = self.subproblems()
+        result = self.solve_subproblems(subproblems, progress)
+        if "sessions" not in result and self.horizon_weeks:
+            components = self.subproblems(windowed=False)
+            # A window may not hold the share of sessions it was given while the whole calendar does
+            if len(components) < len(subproblems):
+                result = self.solve_subproblems(components, progress)
+                result["stats"] = {**result["stats"], "horizon_fallback": True}
+        return result
+
+    def solve_subproblems(self, subproblems, progress=None):
+        """Solves the given subproblems concurrently and merges their results."""
+        self.waiting = len(subproblems)
+        if len(subproblems) == 1:
+            return self.solve_subproblem(subproblems[0], progress)
+
+        latest = {}
+
+        def subproblem_progress(index):
+            def report(subproblem_report):
+                latest[index] = subproblem_report
+                reports = list(latest.values())
+                progress({
+                    "elapsed": max(r["elapsed"] for r in reports),
+                    "objective": sum(r["objective"] for r in reports),
+                    "best_bound": sum(r["best_bound"] for r in reports),
+                    "solutions": sum(r["solutions"] for r in reports),
+                })
+            return report if progress else None
+
+        # Subproblems solved at the same time share the search workers
+        concurrency = min(len(subproblems), os.cpu_count() or 1)
+        self.concurrency = concurrency
+        parameters = subproblems[0].get("parameters") or {}
+        if parameters.get("num_workers"):
+            shared = {**parameters, "num_workers": max(1, parameters["num_workers"] // concurrency)}
+            subproblems = [{**arguments, "parameters": shared} for arguments in subproblems]
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(
+                lambda index: self.solve_subproblem(subproblems[index], subproblem_progress(index)),
+                range(len(subproblems)),
+            ))
+
+        return self.merge(results)
+
+    def solve_subproblem(self, arguments, progress=None):
+        """Solves one subproblem, first computing greedy hints for it when enabled."""
+        if self.deadline is not None:
+            with self.lock:
+                rounds = -(-self.waiting // self.concurrency)
+                self.waiting -= 1
+            arguments = {**arguments, "time_limit": max(0.0, self.deadline - time.monotonic()) / rounds}
+        arguments = {**arguments, "optimize": self.optimize}
+        if self.greedy_hints and not arguments.get("hints") and self.engine_class is not GreedyCombinator:
+            greedy = GreedyCombinator(**arguments).solve()
+            if "sessions" in greedy:
+                arguments = {**arguments, "hints": greedy["sessions"]}
+        return self.engine_class(**arguments).solve(progress)
+
+    def merge(self, results):
+        """Merges subproblem results; the first subproblem without a schedule fails the whole solve.
+
+        Soft constraints such as the weekly load of a class span the
+        subproblems, so the cost is measured again on the merged schedule.
+        """
+        stats = {
+            "subproblems": len(results),
+            "subproblem_stats": [result["stats"] for result in results],
+        }
+        for result in results:
+            if "sessions" not in result:
+                return {**result, "stats": stats}
+
+        sessions = [session for result in results for session in result["sessions"]]
+        evaluator = Combinator(**self.arguments)
+        evaluator.compile(evaluator.create_sessions())
+        stats["objective_terms"] = evaluator.objective_terms(sessions)
+        statuses = {result["status"] for result in results}
+        return {
+            "status": "OPTIMAL" if statuses == {"OPTIMAL"} else "FEASIBLE",
+            "sessions": sessions,
+            "total_cost": evaluator.objective_cost(stats["objective_terms"]),
+            "stats": stats,
+        }
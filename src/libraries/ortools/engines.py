@@ -0,0 +1,21 @@
+from src.libraries.ortools.combinator import Combinator
+from src.libraries.ortools.greedy_combinator import GreedyCombinator
+from src.libraries.ortools.interval_combinator import IntervalCombinator
+from src.libraries.ortools.portfolio import PortfolioCombinator
+
+ENGINES = {
+    "grid": Combinator,
+    "interval": IntervalCombinator,
+    "greedy": GreedyCombinator,
+    "portfolio": PortfolioCombinator,
+}
+
+
+def get_engine(name):
+    """Returns the scheduling engine class registered under ``name``."""
+    try:
+        return ENGINES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown scheduling engine '{name}'. Available engines: {', '.join(ENGINES)}."
+        )
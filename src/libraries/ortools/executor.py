@@ -0,0 +1,119 @@
+import asyncio
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor
+
+from src.libraries.ortools.decomposition import DecomposedSolver
+from src.libraries.ortools.engines import get_engine
+
+PROGRESS_POLL_INTERVAL = 0.5
+
+
+class SolverQueueFullError(Exception):
+    """Raised when too many solves are already running or waiting for a worker."""
+
+
+def _warm_up():
+    """Pre-imports OR-Tools so a worker's first solve does not pay for it."""
+    from ortools.sat.python import cp_model  # noqa: F401
+
+
+def run_engine(engine, arguments, options=None, progress_queue=None):
+    """Solves the named engine from its serialized inputs, one instance per independent subproblem.
+
+    ``options`` are passed to ``DecomposedSolver``. Progress reports are
+    forwarded to ``progress_queue`` when one is given.
+    """
+    progress = progress_queue.put if progress_queue is not None else None
+    return DecomposedSolver(get_engine(engine), arguments, **(options or {})).solve(progress)
+
+
+class SolverExecutor:
+    """Runs scheduling engines in a bounded process pool, off the event loop.
+
+    At most ``max_workers`` solves run at the same time and at most
+    ``max_queue`` more may wait for a free worker; further submissions are
+    rejected with ``SolverQueueFullError`` instead of piling up.
+    """
+
+    def __init__(self, max_workers, max_queue):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = None
+        self._manager = None
+        self._pending = 0
+
+    @property
+    def pending(self):
+        """Number of solves currently running or queued."""
+        return self._pending
+
+    def start(self):
+        """Spawns the worker processes and pre-imports OR-Tools in each of them."""
+        if self._pool is None:
+            context = multiprocessing.get_context("spawn")
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=context,
+                initializer=_warm_up,
+            )
+            for _ in range(self.max_workers):
+                self._pool.submit(_warm_up)
+            # Hosts the queues workers report their progress through
+            self._manager = context.Manager()
+        return self._pool
+
+    def _progress_queue(self):
+        """Returns a queue the worker processes can report progress through."""
+        self.start()
+        return self._manager.Queue()
+
+    def shutdown(self):
+        """Stops the worker processes, cancelling queued solves."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    async def solve(self, engine, arguments, on_progress=None, options=None):
+        """Solves ``engine`` built from ``arguments`` in a worker and returns its result.
+
+        ``options`` tune how the problem is decomposed and bound its solve
+        time. ``on_progress`` is called on the event loop with every progress
+        report emitted by the worker while the search runs.
+        """
+        if self._pending >= self.max_workers + self.max_queue:
+            raise SolverQueueFullError(
+                f"Solver queue is full ({self._pending} schedules already running or waiting)"
+            )
+
+        loop = asyncio.get_running_loop()
+        progress_queue = None if on_progress is None else self._progress_queue()
+        job = self.start().submit(run_engine, engine, arguments, options, progress_queue)
+        self._pending += 1
+        # Released once the worker is done, not when the caller stops waiting:
+        # a cancelled solve keeps its worker busy until the search ends
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+
+        future = asyncio.wrap_future(job)
+        if on_progress is None:
+            return await future
+        while not future.done():
+            await asyncio.wait({future}, timeout=PROGRESS_POLL_INTERVAL)
+            self._drain(progress_queue, on_progress)
+        return future.result()
+
+    def _release(self):
+        """Frees the place of a solve whose worker has finished."""
+        self._pending -= 1
+
+    @staticmethod
+    def _drain(progress_queue, on_progress):
+        """Forwards every pending progress report to ``on_progress``."""
+        while True:
+            try:
+                on_progress(progress_queue.get_nowait())
+            except queue.Empty:
+                return
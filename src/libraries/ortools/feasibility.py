@@ -0,0 +1,161 @@
+from src.libraries.ortools.combinator import Combinator, count_rooms, within_period
+
+
+def analyze_feasibility(arguments):
+    """Looks for reasons the scheduling inputs cannot be satisfied, without building a model.
+
+    Takes the arguments of ``Combinator`` and returns a list of conflicts, each
+    a dict with a ``type``, a readable ``message`` and the ids involved. The
+    checks compare session counts against upper bounds on how many sessions
+    fit, day by day, so they take milliseconds where a solve proving
+    infeasibility may take minutes. An empty list does not guarantee that a
+    schedule exists.
+    """
+    combinator = Combinator(**arguments)
+    conflicts = []
+    start_hour, end_hour = combinator.start_hour, combinator.end_hour
+    for course in combinator.courses:
+        duration = combinator.course_duration(course)
+        if duration > end_hour - start_hour:
+            conflicts.append({
+                "type": "session_duration",
+                "course_id": course['id'],
+                "message": (
+                    f"Sessions of {duration} minutes of course '{course['name']}' (assignment {course['id']}) "
+                    f"do not fit in the {end_hour - start_hour} minutes of a school day."
+                ),
+            })
+    if conflicts:
+        return conflicts
+
+    course_dates = {str(combinator.calendar[day_index]['date']) for day_index in combinator.course_days}
+    if not course_dates:
+        return [{"type": "no_course_days", "message": "The calendar has no course day."}]
+
+    domains, _ = combinator.compute_domains()
+    teachers = {}
+    for course in combinator.courses:
+        teacher_key = combinator.teacher_key(course)
+        teacher = teachers.setdefault(teacher_key, {"teacher": course['teacher'], "sessions": 0, "days": {}})
+        required = combinator.count_sessions(course)
+        teacher["sessions"] += required
+
+        capacity = 0
+        for d, windows in domains[course['id']].items():
+            fitting = combinator.fitting_sessions(windows, combinator.course_duration(course))
+            capacity += fitting
+            teacher["days"][d] = max(teacher["days"].get(d, 0), fitting)
+
+        if required > capacity:
+            period = ""
+            if course.get('start_date') or course.get('end_date'):
+                period = (
+                    f" between {course.get('start_date') or 'the start'} and {course.get('end_date') or 'the end'}"
+                )
+            conflicts.append({
+                "type": "course_capacity",
+                "course_id": course['id'],
+                "teacher_id": course['teacher'].get('id'),
+                "message": (
+                    f"Course '{course['name']}' (assignment {course['id']}) needs {required} sessions of "
+                    f"{combinator.course_duration(course)} minutes but the availability of {course['teacher']['name']} "
+                    f"on course days{period} only fits {capacity}."
+                ),
+            })
+
+    for teacher_key, teacher in teachers.items():
+        availability = teacher["teacher"]['availability']
+        name = teacher["teacher"]['name']
+        if not availability:
+            conflicts.append({
+                "type": "teacher_no_availability",
+                "teacher_id": teacher["teacher"].get('id'),
+                "message": f"{name} has no availability.",
+            })
+        elif not course_dates.intersection(availability):
+            conflicts.append({
+                "type": "teacher_availability_outside_course_days",
+                "teacher_id": teacher["teacher"].get('id'),
+                "message": f"None of the availabilities of {name} falls on a course day.",
+            })
+        elif teacher["sessions"] > sum(teacher["days"].values()):
+            conflicts.append({
+                "type": "teacher_capacity",
+                "teacher_id": teacher["teacher"].get('id'),
+                "message": (
+                    f"{name} has {teacher['sessions']} sessions to give but their availability on course days "
+                    f"only fits {sum(teacher['days'].values())}."
+                ),
+            })
+
+    # A class attends one session at a time, so its sessions must fit in the school days of its subject periods
+    classes = {}
+    for course in combinator.courses:
+        if course.get('class_id') is None:
+            continue
+        duration = combinator.course_duration(course)
+        fitting = combinator.fitting_sessions([(start_hour, end_hour - duration)], duration)
+        entry = classes.setdefault(course['class_id'], {"sessions": 0, "days": {}})
+        entry["sessions"] += combinator.count_sessions(course)
+        for d, day_index in enumerate(combinator.course_days):
+            day = combinator.calendar[day_index]['date']
+            if not within_period(day, course.get('start_date'), course.get('end_date')):
+                continue
+            entry["days"][d] = max(entry["days"].get(d, 0), fitting)
+    for class_id, entry in classes.items():
+        capacity = sum(entry["days"].values())
+        if entry["sessions"] > capacity:
+            conflicts.append({
+                "type": "class_capacity",
+                "class_id": class_id,
+                "message": (
+                    f"Class {class_id} has {entry['sessions']} sessions to attend but its {len(entry['days'])} "
+                    f"course days only fit {capacity}."
+                ),
+            })
+
+    if combinator.room_capacities:
+        largest_room = max(combinator.room_capacities)
+        for course in combinator.courses:
+            if (course.get('students') or 0) > largest_room:
+                conflicts.append({
+                    "type": "room_size",
+                    "course_id": course['id'],
+                    "message": (
+                        f"Course '{course['name']}' (assignment {course['id']}) is given to {course['students']} "
+                        f"students but the largest room only holds {largest_room}."
+                    ),
+                })
+
+    # Rooms: the sessions of courses confined to a period must fit in the rooms on the course days of that
+    # period, and the sessions of the larger classes in the rooms large enough for them
+    periods = {(course.get('start_date'), course.get('end_date')) for course in combinator.courses}
+    for students, limit in combinator.room_limits:
+        limit_courses = [course for course in combinator.courses if (course.get('students') or 0) >= students]
+        if not limit_courses:
+            continue
+        shortest = min(combinator.course_duration(course) for course in limit_courses)
+        day_capacity = limit * combinator.fitting_sessions([(start_hour, end_hour - shortest)], shortest)
+        for start_date, end_date in periods:
+            days = [
+                day_index for day_index in combinator.course_days
+                if within_period(combinator.calendar[day_index]['date'], start_date, end_date)
+            ]
+            required = sum(
+                combinator.count_sessions(course) for course in limit_courses
+                if (not start_date or (course.get('start_date') and course['start_date'] >= start_date))
+                and (not end_date or (course.get('end_date') and course['end_date'] <= end_date))
+            )
+            if required > day_capacity * len(days):
+                rooms = f"{count_rooms(limit)} holding {students} students" if students else count_rooms(limit)
+                sessions = f"sessions of classes of {students} students or more" if students else "sessions"
+                conflicts.append({
+                    "type": "room_capacity",
+                    "students": students,
+                    "message": (
+                        f"{required} {sessions} must take place between {start_date or 'the start'} and "
+                        f"{end_date or 'the end'} but at most {day_capacity * len(days)} fit in {rooms} "
+                        f"over {len(days)} course days."
+                    ),
+                })
+    return conflicts
@@ -0,0 +1,176 @@
+import time
+
+import numpy as np
+
+from src.libraries.ortools.combinator import Combinator
+
+
+class GreedyCombinator(Combinator):
+    """First-fit variant placing sessions one by one, without a solver.
+
+    Each course day is a row of cells of one time quantum. Teacher, class and
+    room occupancy are kept as NumPy bitmaps, so the feasible starts of a
+    session are found with a few vectorized operations. Sessions of the most
+    constrained courses are placed first, each on the least loaded day for its
+    course and teacher, within the preferred time windows when possible and
+    at the earliest start, which packs the days. The timetable is found in
+    milliseconds but is not optimized, and a failure to place a session does
+    not prove infeasibility.
+    The output of ``solve()`` is the same as ``Combinator.solve()``.
+    """
+
+    def cell(self, h):
+        """Returns the cell index of start minute ``h``."""
+        return (h - self.start_hour) // self.time_quantum
+
+    def start_mask(self, domain, shape):
+        """Marks the cells where a session of the given domain may start."""
+        mask = np.zeros(shape, dtype=bool)
+        for d, windows in domain.items():
+            for first, last in windows:
+                mask[d, self.cell(first):self.cell(last) + 1] = True
+        return mask
+
+    def window_sums(self, occupancy, length):
+        """Sums ``occupancy`` over the ``length`` cells starting at every cell."""
+        sums = np.zeros((occupancy.shape[0], occupancy.shape[1] + 1), dtype=np.int32)
+        np.cumsum(occupancy, axis=1, out=sums[:, 1:])
+        return sums[:, length:] - sums[:, :-length]
+
+    def solve(self, progress=None):
+        """Places the sessions greedily and returns the schedule."""
+        started = time.perf_counter()
+        sessions = self.create_sessions()
+        self.compile(sessions)
+        self.domains, domain_stats = self.compute_domains()
+        self.pinned = self.assign_records(self.fixed_sessions, sessions)
+        courses = self.course_index
+
+        lengths = {course_id: len(offsets) for course_id, offsets in self.covered_offsets.items()}
+        n_cells = len(self.time_slots())
+        # Padded so that a session starting in the last cells still fits in the bitmaps
+        shape = (len(self.course_days), n_cells + max(lengths.values(), default=1) - 1)
+        teachers = {self.teacher_key(course): np.zeros(shape, dtype=bool) for course in self.courses}
+        classes = {course.get('class_id'): np.zeros(shape, dtype=bool) for course in self.courses}
+        # Sessions held at once in the rooms never booked under each room limit, and the limits each course
+        # falls under; the cells each booked room is held, and the booked rooms each course fits in
+        rooms = [np.zeros(shape, dtype=np.int32) for _ in self.room_limits]
+        course_rooms = {
+            course_id: [
+                (occupancy, self.pool_limits[(students, limit)])
+                for occupancy, (students, limit) in zip(rooms, self.room_limits)
+                if (course.get('students') or 0) >= students
+            ]
+            for course_id, course in courses.items()
+        }
+        booked = {room_id: self.booked_cells(spans, shape[1]) > 0 for room_id, (_, spans) in self.booked_room_spans.items()}
+        course_booked = {
+            course_id: [
+                room_id for room_id, (capacity, _) in sorted(self.booked_room_spans.items(), key=lambda item: item[1][0])
+                if not self.room_capacities or capacity >= (course.get('students') or 0)
+            ]
+            for course_id, course in courses.items()
+        }
+        course_loads = {course_id: np.zeros(shape[0], dtype=np.int32) for course_id in courses}
+        teacher_loads = {teacher: np.zeros(shape[0], dtype=np.int32) for teacher in teachers}
+        masks = {
+            course_id: self.start_mask(self.domains[course_id], (shape[0], n_cells)) for course_id in courses
+        }
+        # Cells where a session of each course would start outside the preferred time windows
+        outside = {
+            course_id: np.array([
+                not self.preferred_start(h, self.durations[course_id]) for h in self.time_slots()
+            ]) for course_id in courses
+        }
+
+        def place(session, d, h):
+            course_id, _ = session
+            teacher = self.teacher_key(courses[course_id])
+            length = lengths[course_id]
+            i = self.cell(h)
+            teachers[teacher][d, i:i + length] = True
+            classes[courses[course_id].get('class_id')][d, i:i + length] = True
+            # A room never booked if one is left, else the smallest booked room free all along
+            room_id = None
+            if any((occupancy[d, i:i + length] >= limit).any() for occupancy, limit in course_rooms[course_id]):
+                room_id = next(
+                    (room_id for room_id in course_booked[course_id] if not booked[room_id][d, i:i + length].any()),
+                    None,
+                )
+            if room_id is None:
+                for occupancy, _ in course_rooms[course_id]:
+                    occupancy[d, i:i + length] += 1
+            else:
+                booked[room_id][d, i:i + length] = True
+            course_loads[course_id][d] += 1
+            teacher_loads[teacher][d] += 1
+            placed[session] = (d, h)
+
+        placed = {}
+        for session, (d, h) in self.pinned.items():
+            place(session, d, h)
+
+        # Courses with the fewest feasible starts per session of their teacher go first
+        teacher_sessions = {}
+        for course_id, _ in sessions:
+            teacher = self.teacher_key(courses[course_id])
+            teacher_sessions[teacher] = teacher_sessions.get(teacher, 0) + 1
+        free_sessions = sorted(
+            (session for session in sessions if session not in self.pinned),
+            key=lambda session: (
+                masks[session[0]].sum() / teacher_sessions[self.teacher_key(courses[session[0]])],
+                session,
+            ),
+        )
+
+        unplaced = []
+        for session in free_sessions:
+            course_id, _ = session
+            teacher = self.teacher_key(courses[course_id])
+            length = lengths[course_id]
+            busy = teachers[teacher]
+            if courses[course_id].get('class_id') is not None:
+                busy = busy | classes[courses[course_id]['class_id']]
+            feasible = masks[course_id] & (self.window_sums(busy, length)[:, :n_cells] == 0)
+            room_free = np.ones_like(feasible)
+            for occupancy, limit in course_rooms[course_id]:
+                room_free &= self.window_sums(occupancy >= limit, length)[:, :n_cells] == 0
+            for room_id in course_booked[course_id]:
+                room_free |= self.window_sums(booked[room_id], length)[:, :n_cells] == 0
+            feasible &= room_free
+            days, cells = np.nonzero(feasible)
+            if not len(days):
+                unplaced.append(session)
+                continue
+            best = np.lexsort((
+                cells, days, outside[course_id][cells], teacher_loads[teacher][days], course_loads[course_id][days]
+            ))[0]
+            place(session, int(days[best]), self.start_hour + int(cells[best]) * self.time_quantum)
+
+        stats = {
+            "domains": domain_stats,
+            "pinned": len(self.pinned),
+            "placed": len(placed),
+            "unplaced": len(unplaced),
+        }
+        if unplaced:
+            return {"status": "UNKNOWN", "stats": stats}
+
+        schedule = [
+            self.schedule_record(courses[course_id], d, h) for (course_id, _), (d, h) in sorted(placed.items())
+        ]
+        stats["objective_terms"] = self.objective_terms(schedule)
+        total_cost = self.objective_cost(stats["objective_terms"])
+        if progress:
+            progress({
+                "elapsed": time.perf_counter() - started,
+                "objective": total_cost,
+                "best_bound": 0,
+                "solutions": 1,
+            })
+        return {
+            "status": "FEASIBLE",
+            "sessions": schedule,
+            "total_cost": total_cost,
+            "stats": stats,
+        }
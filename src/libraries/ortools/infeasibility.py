@@ -0,0 +1,212 @@
+import time
+
+from ortools.sat.python import cp_model
+
+from src.libraries.ortools.combinator import MINUTES_PER_DAY, count_rooms, within_period
+
+# Rounds of re-solving with only the last core's assumptions, each usually shrinking the core
+CORE_ROUNDS = 3
+# Seconds the explanation may take when the solve itself has no time limit
+EXPLAIN_TIME_LIMIT = 30
+
+
+class InfeasibilityExplainer:
+    """Finds a set of constraints of an infeasible problem that cannot all hold.
+
+    Each constraint family, e.g. a course's subject period, a teacher's
+    availability or the room pool, is guarded by an assumption literal. The
+    model is re-solved under all the assumptions and the core returned by
+    ``SufficientAssumptionsForInfeasibility`` is translated into messages.
+    """
+
+    def __init__(self, combinator):
+        self.combinator = combinator
+        self.model = cp_model.CpModel()
+        self.assumptions = {}
+        self.deadline = None
+
+    def assumption(self, key, message):
+        """Returns the literal guarding a constraint family, created on first use."""
+        if key not in self.assumptions:
+            self.assumptions[key] = (self.model.NewBoolVar(f"assume_{'_'.join(map(str, key))}"), message)
+        return self.assumptions[key][0]
+
+    def booked_note(self, pair):
+        """Notes in a message that other schedules book some rooms of a room limit."""
+        return ", less those booked by other schedules" if self.combinator.limit_bookings[pair] else ""
+
+    def both(self, a, b):
+        """Returns a literal true exactly when ``a`` and ``b`` are."""
+        var = self.model.NewBoolVar("")
+        self.model.AddBoolAnd([a, b]).OnlyEnforceIf(var)
+        self.model.AddBoolOr([a.Not(), b.Not()]).OnlyEnforceIf(var.Not())
+        return var
+
+    def build(self, sessions):
+        """Builds the guarded model: every session may take any start of the school day."""
+        c = self.combinator
+        q = c.time_quantum
+        courses = {course['id']: course for course in c.courses}
+        first = -(-c.start_hour // q)
+        slots_per_day = MINUTES_PER_DAY // q
+        teacher_intervals = {}
+        class_intervals = {}
+        # Per room limit, the intervals of the sessions it bounds
+        room_intervals = {limit: [] for limit in c.room_limits}
+        # Per day presences of each teacher and of all sessions, for the redundant day capacities
+        teacher_days = {}
+        room_days = {}
+        course_positions = {}
+        rooms = self.assumption(
+            ("rooms",),
+            f"the sessions held at the same time fit in {count_rooms(c.nb_rooms)}{self.booked_note(c.room_limits[0])}",
+        )
+        room_guards = {c.room_limits[0]: rooms}
+        for students, limit in c.room_limits[1:]:
+            room_guards[(students, limit)] = self.assumption(
+                ("large_rooms", students),
+                f"the sessions of classes of {students} students or more held at the same time fit in "
+                f"{count_rooms(limit)} holding them{self.booked_note((students, limit))}",
+            )
+
+        for session in sessions:
+            course_id, _ = session
+            course = courses[course_id]
+            teacher_key = c.teacher_key(course)
+            teacher_name = course['teacher']['name']
+            duration = c.course_duration(course)
+            last = (c.end_hour - duration) // q
+            label = f"course '{course['name']}' (assignment {course_id})"
+            count = c.count_sessions(course)
+            volume = self.assumption(
+                ("volume", course_id),
+                f"the session of {label} takes place" if count == 1 else f"all {count} sessions of {label} take place",
+            )
+            period = self.assumption(
+                ("period", course_id), f"{label} stays between {course.get('start_date') or 'the start'} "
+                                       f"and {course.get('end_date') or 'the end'}"
+            )
+            availability = self.assumption(
+                ("availability", teacher_key), f"{teacher_name} only teaches within their availability"
+            )
+            overlap = self.assumption(("overlap", teacher_key), f"{teacher_name} gives one session at a time")
+            resources = [(overlap, teacher_intervals.setdefault(teacher_key, []))] + [
+                (room_guards[(students, limit)], room_intervals[(students, limit)])
+                for students, limit in c.room_limits if (course.get('students') or 0) >= students
+            ]
+            if course.get('class_id') is not None:
+                class_overlap = self.assumption(
+                    ("class_overlap", course['class_id']), f"class {course['class_id']} attends one session at a time"
+                )
+                resources.append((class_overlap, class_intervals.setdefault(course['class_id'], [])))
+
+            presences = []
+            position = self.model.NewIntVar(0, len(c.course_days) * slots_per_day, "")
+            if session not in c.pinned:
+                course_positions.setdefault(course_id, []).append(position)
+            for d, day_index in enumerate(c.course_days):
+                day = c.calendar[day_index]['date']
+                presence = self.model.NewBoolVar("")
+                start = self.model.NewIntVar(d * slots_per_day + first, d * slots_per_day + last, "")
+                presences.append(presence)
+                self.model.Add(position == start).OnlyEnforceIf(presence)
+                room_days.setdefault(d, []).append(presence)
+                if session not in c.pinned:
+                    entry = teacher_days.setdefault((teacher_key, d), [availability, overlap, [], 0])
+                    entry[2].append(presence)
+                    entry[3] = max(entry[3], c.fitting_sessions(c.domains[course_id].get(d, []), duration))
+
+                if not within_period(day, course.get('start_date'), course.get('end_date')):
+                    self.model.Add(presence == 0).OnlyEnforceIf(period)
+
+                windows = [
+                    (d * slots_per_day + -(-max(start_h, c.start_hour) // q),
+                     d * slots_per_day + (min(end_h, c.end_hour) - duration) // q)
+                    for start_h, end_h in course['teacher']['availability'].get(str(day), [])
+                ]
+                windows = [(lower, upper) for lower, upper in windows if lower <= upper]
+                choices = [self.model.NewBoolVar("") for _ in windows]
+                for choice, (lower, upper) in zip(choices, windows):
+                    self.model.Add(start >= lower).OnlyEnforceIf(choice)
+                    self.model.Add(start <= upper).OnlyEnforceIf(choice)
+                self.model.Add(sum(choices) == presence).OnlyEnforceIf(availability)
+
+                if session in c.pinned:
+                    kept_d, kept_h = c.pinned[session]
+                    kept = self.assumption(("pinned",), "kept sessions stay where they are")
+                    if d == kept_d:
+                        self.model.Add(presence == 1).OnlyEnforceIf(kept)
+                        self.model.Add(start * q == d * MINUTES_PER_DAY + kept_h).OnlyEnforceIf(kept)
+                    else:
+                        self.model.Add(presence == 0).OnlyEnforceIf(kept)
+
+                for guard, intervals in resources:
+                    intervals.append(self.model.NewOptionalFixedSizeIntervalVar(
+                        start * q, duration, self.both(presence, guard), ""
+                    ))
+
+            self.model.AddAtMostOne(presences)
+            self.model.Add(sum(presences) == 1).OnlyEnforceIf(volume)
+
+        for intervals in list(teacher_intervals.values()) + list(class_intervals.values()):
+            self.model.AddNoOverlap(intervals)
+        for (students, limit), intervals in room_intervals.items():
+            intervals = intervals + [
+                self.model.NewFixedSizeIntervalVar(d * MINUTES_PER_DAY + start, end - start, "")
+                for d, start, end in c.limit_bookings[(students, limit)]
+            ]
+            self.model.AddCumulative(intervals, [1] * len(intervals), limit)
+
+        # Redundant constraints, as in the solved model, so that the proofs stay short
+        for availability, overlap, presences, capacity in teacher_days.values():
+            if len(presences) > capacity:
+                self.model.Add(sum(presences) <= capacity).OnlyEnforceIf([availability, overlap])
+        room_capacity = c.nb_rooms * c.fitting_sessions([(c.start_hour, c.end_hour - c.shortest_duration())])
+        for presences in room_days.values():
+            if len(presences) > room_capacity:
+                self.model.Add(sum(presences) <= room_capacity).OnlyEnforceIf(rooms)
+        for course_id, positions in course_positions.items():
+            volume = self.assumptions[("volume", course_id)][0]
+            for earlier, later in zip(positions, positions[1:]):
+                self.model.Add(earlier <= later).OnlyEnforceIf(volume)
+
+    def create_solver(self):
+        """Creates a solver able to report cores, limited to the time left."""
+        solver = cp_model.CpSolver()
+        # Cores are only reported by a single search worker
+        solver.parameters.num_workers = 1
+        solver.parameters.max_time_in_seconds = max(0.0, self.deadline - time.monotonic())
+        return solver
+
+    def explain(self, sessions):
+        """Returns the conflicts explaining why the sessions cannot be scheduled, empty if none is found."""
+        self.deadline = self.combinator.deadline or time.monotonic() + EXPLAIN_TIME_LIMIT
+        self.build(sessions)
+        keys = {literal.Index(): key for key, (literal, _) in self.assumptions.items()}
+        core = None
+        candidates = list(self.assumptions)
+
+        # Each core is sufficient on its own; re-solving under it alone usually returns a smaller one
+        for _ in range(CORE_ROUNDS):
+            self.model.ClearAssumptions()
+            self.model.AddAssumptions([self.assumptions[key][0] for key in candidates])
+            solver = self.create_solver()
+            if solver.Solve(self.model) != cp_model.INFEASIBLE:
+                break
+            core = [keys[index] for index in solver.SufficientAssumptionsForInfeasibility()]
+            if not core or len(core) == len(candidates):
+                break
+            candidates = core
+
+        if not core:
+            return []
+        return [{
+            "type": "infeasible_core",
+            "message": "These constraints cannot all hold: " + "; ".join(
+                self.assumptions[key][1] for key in core
+            ) + ".",
+            "constraints": [
+                {"type": key[0], "id": key[1] if len(key) > 1 else None, "message": self.assumptions[key][1]}
+                for key in core
+            ],
+        }]
@@ -0,0 +1,146 @@
+import numpy as np
+from ortools.sat.python import cp_model
+
+from src.libraries.ortools.combinator import MINUTES_PER_DAY, Combinator
+
+
+class IntervalCombinator(Combinator):
+    """Combinator variant built on optional interval variables.
+
+    Instead of one boolean per session, day and minute, every session gets one
+    optional interval per course day. Course days are laid out on a single time
+    axis (day ``d`` covers ``[d * 1440, (d + 1) * 1440)``) so that teacher and room
+    constraints can be expressed with ``AddNoOverlap`` and ``AddCumulative``.
+    Start variables count time quanta, so their domains shrink with ``time_quantum``.
+    The output of ``solve()`` is the same as ``Combinator.solve()``.
+    """
+
+    def slot_bounds(self, d, lower, upper):
+        """Converts a window of start minutes of day ``d`` into global quantum indexes."""
+        offset = d * (MINUTES_PER_DAY // self.time_quantum)
+        return offset + -(-lower // self.time_quantum), offset + upper // self.time_quantum
+
+    def create_variables(self, sessions):
+        """Creates one optional interval per session and feasible course day."""
+        x = {}
+        # The (course, day) of every interval and the variable indexes of its presence and start
+        self.interval_days = []
+        presence_indexes = []
+        start_indexes = []
+        for session in sessions:
+            duration = self.durations[session[0]]
+            x[session] = {}
+            for d, windows in self.session_domain(session).items():
+                suffix = f"s{session}_d{d}"
+                presence = self.model.NewBoolVar(f"p_{suffix}")
+                domain = cp_model.Domain.FromIntervals(
+                    [list(self.slot_bounds(d, first, last)) for first, last in windows]
+                )
+                start = self.model.NewIntVarFromDomain(domain, f"start_{suffix}")
+                interval = self.model.NewOptionalFixedSizeIntervalVar(
+                    start * self.time_quantum, duration, presence, f"interval_{suffix}"
+                )
+                x[session][d] = (presence, start, interval)
+                self.interval_days.append((session[0], d))
+                presence_indexes.append(presence.Index())
+                start_indexes.append(start.Index())
+        self.presence_indexes = np.array(presence_indexes, dtype=np.int64)
+        self.start_indexes = np.array(start_indexes, dtype=np.int64)
+        return x
+
+    def add_session_constraints(self, sessions, x):
+        """Ensures each session is scheduled exactly once."""
+        for session in sessions:
+            self.model.AddExactlyOne(presence for presence, _, _ in x[session].values())
+
+    def add_no_overlap_constraints(self, sessions, x):
+        """Prevents overlapping sessions for the same teacher or the same class.
+
+        The optional intervals of each session, one per course day, are shared
+        by the teacher and class constraints.
+        """
+        for resource_sessions in self.resource_index.values():
+            self.model.AddNoOverlap(
+                interval for session in resource_sessions for _, _, interval in x[session].values()
+            )
+
+    def add_room_constraints(self, sessions, x):
+        """Ensures the number of sessions does not exceed the rooms left free by other schedules."""
+        for group, limit, booked in self.room_groups(sessions):
+            intervals = [interval for session in group for _, _, interval in x[session].values()]
+            intervals += [
+                self.model.NewFixedSizeIntervalVar(d * MINUTES_PER_DAY + start, end - start, "")
+                for d, start, end in booked
+            ]
+            self.model.AddCumulative(intervals, [1] * len(intervals), limit)
+
+    def session_position(self, x, session):
+        """Returns the start of a session on the global time axis, in minutes."""
+        position = self.model.NewIntVar(0, len(self.course_days) * MINUTES_PER_DAY, f"position_s{session}")
+        for presence, start, _ in x[session].values():
+            self.model.Add(position == start * self.time_quantum).OnlyEnforceIf(presence)
+        return position
+
+    def position_variable(self, x, session):
+        """Returns a variable equal to the start of a session on the global time axis, in minutes."""
+        return self.session_position(x, session)
+
+    def day_presences(self, x, session):
+        """Returns, per course day, the literal true when the session takes place that day."""
+        return {d: presence for d, (presence, _, _) in x[session].items()}
+
+    def day_starts(self, x, session):
+        """Returns, per course day, the presence literal of the session and its start minute that day."""
+        return {
+            d: (presence, start * self.time_quantum - d * MINUTES_PER_DAY)
+            for d, (presence, start, _) in x[session].items()
+        }
+
+    def outside_preferred_windows(self, sessions, x):
+        """Returns an expression counting the sessions held outside the preferred time windows.
+
+        Session days whose starts all lie in, or all out of, the preferred
+        windows need no variable; the others get a literal set when the start
+        lies in them.
+        """
+        outside = []
+        for session in sessions:
+            duration = self.durations[session[0]]
+            preferred = [(first, last - duration) for first, last in self.preferred_windows if first <= last - duration]
+            for d, (presence, start, _) in x[session].items():
+                domain = cp_model.Domain.FromIntervals(
+                    [list(self.slot_bounds(d, first, last)) for first, last in self.session_domain(session)[d]]
+                )
+                inside = domain.intersection_with(cp_model.Domain.FromIntervals(
+                    [list(self.slot_bounds(d, first, last)) for first, last in preferred]
+                ))
+                if inside.is_empty():
+                    outside.append(presence)
+                elif inside.size() < domain.size():
+                    preferred_start = self.model.NewBoolVar(f"preferred_s{session}_d{d}")
+                    self.model.AddLinearExpressionInDomain(start, inside).OnlyEnforceIf(preferred_start)
+                    self.model.AddImplication(preferred_start, presence)
+                    self.preferred_literals[(session, d)] = preferred_start
+                    outside.append(presence - preferred_start)
+        return cp_model.LinearExpr.Sum(outside)
+
+    def add_hints(self, sessions, x):
+        """Feeds the previous schedule to the solver as a starting point."""
+        matched = self.match_hints(sessions)
+        for session, (d, h) in matched.items():
+            presence, start, _ = x[session][d]
+            self.model.AddHint(presence, 1)
+            self.model.AddHint(start, self.slot_bounds(d, h, h)[0])
+        self.add_objective_hints(matched)
+        return {"given": len(self.hints), "matched": len(matched)}
+
+    def extract_schedule(self, solver, sessions, x):
+        """Reads the scheduled sessions back from a solved model, decoding only the present intervals."""
+        values = self.solution_values(solver)
+        active = np.flatnonzero(values[self.presence_indexes])
+        starts = values[self.start_indexes[active]] * self.time_quantum
+        schedule = []
+        for i, start in zip(active, starts.tolist()):
+            course_id, d = self.interval_days[i]
+            schedule.append(self.schedule_record(self.course_index[course_id], d, start - d * MINUTES_PER_DAY))
+        return schedule
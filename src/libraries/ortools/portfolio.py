@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ortools.sat.python import cp_model
+
+from src.libraries.ortools.combinator import Combinator
+from src.libraries.ortools.greedy_combinator import GreedyCombinator
+from src.libraries.ortools.interval_combinator import IntervalCombinator
+
+# Strategies raced by the portfolio: name, engine and CP-SAT parameter overrides
+STRATEGIES = [
+    ("greedy", GreedyCombinator, {}),
+    ("grid", Combinator, {}),
+    ("grid_fixed", Combinator, {"search_branching": cp_model.FIXED_SEARCH, "random_seed": 7}),
+    ("interval", IntervalCombinator, {"linearization_level": 2}),
+]
+# Statuses proving that no other strategy can do better
+PROVEN_STATUSES = ("OPTIMAL", "INFEASIBLE")
+
+
+class PortfolioCombinator:
+    """Races several engines on the same inputs under one wall-clock budget.
+
+    The CP-SAT strategies share the cores and all stop as soon as one of them
+    proves its result optimal or the problem infeasible. Otherwise the best
+    timetable found when ``time_limit`` runs out is returned: every engine
+    measures the soft constraints of its timetable alike, so results are
+    compared by that cost, the greedy timetable losing ties. Takes the
+    arguments of ``Combinator`` and returns the output of ``Combinator.solve()``.
+    """
+
+    def __init__(self, time_limit=None, parameters=None, **arguments):
+        self.time_limit = time_limit
+        self.parameters = parameters or {}
+        self.arguments = arguments
+
+    def create_engines(self):
+        """Builds one engine per strategy, splitting the search workers between the CP-SAT ones."""
+        solvers = sum(1 for _, engine_class, _ in STRATEGIES if engine_class is not GreedyCombinator)
+        num_workers = max(1, (self.parameters.get("num_workers") or os.cpu_count() or 1) // solvers)
+        return {
+            name: engine_class(
+                **self.arguments,
+                time_limit=self.time_limit,
+                parameters={**self.parameters, "num_workers": num_workers, **parameters},
+            )
+            for name, engine_class, parameters in STRATEGIES
+        }
+
+    @staticmethod
+    def rank(name, result):
+        """Orders results from best to worst: by cost, then optimal, then solver found, then greedy."""
+        return result["total_cost"], result["status"] != "OPTIMAL", name == "greedy"
+
+    @staticmethod
+    def improving(progress):
+        """Wraps ``progress`` so it only hears of solutions cheaper than all those reported before."""
+        if progress is None:
+            return None
+        lock = threading.Lock()
+        best = {}
+
+        def report(update):
+            with lock:
+                if "objective" in best and update["objective"] >= best["objective"]:
+                    return
+                best["objective"] = update["objective"]
+            progress(update)
+
+        return report
+
+    def solve(self, progress=None):
+        """Runs every strategy and returns the best schedule found."""
+        started = time.monotonic()
+        engines = self.create_engines()
+        results = {}
+        # The strategies race each other, so only report a solution beating all of them
+        progress = self.improving(progress)
+
+        with ThreadPoolExecutor(max_workers=len(engines)) as pool:
+            futures = {pool.submit(engine.solve, progress): name for name, engine in engines.items()}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = futures[future]
+                    results[name] = future.result()
+                    if name != "greedy" and results[name]["status"] in PROVEN_STATUSES:
+                        for engine in engines.values():
+                            engine.stop()
+
+        stats = {
+            "elapsed": time.monotonic() - started,
+            "strategies": {name: result["status"] for name, result in results.items()},
+        }
+        proven = [result for name, result in results.items() if name != "greedy" and result["status"] == "INFEASIBLE"]
+        if proven:
+            conflicts = next((result["conflicts"] for result in proven if result.get("conflicts")), [])
+            return {"status": "INFEASIBLE", "stats": stats, "conflicts": conflicts}
+
+        found = [(name, result) for name, result in results.items() if "sessions" in result]
+        if not found:
+            return {"status": "UNKNOWN", "stats": stats}
+
+        name, result = min(found, key=lambda item: self.rank(*item))
+        stats["winner"] = name
+        stats["winner_stats"] = result["stats"]
+        return {**result, "stats": stats}
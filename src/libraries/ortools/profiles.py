@@ -0,0 +1,40 @@
+import os
+
+# Solver profiles: the time limit of the solve and the CP-SAT parameters of its searches
+SOLVER_PROFILES = {
+    "preview": {
+        "time_limit": 10,
+        "parameters": {"stop_after_first_solution": True, "random_seed": 0},
+    },
+    "balanced": {
+        "time_limit": 60,
+        "parameters": {"random_seed": 0},
+    },
+    "optimal": {
+        "time_limit": 600,
+        "parameters": {"random_seed": 0, "linearization_level": 2},
+    },
+}
+
+
+def get_solver_profile(name):
+    """Returns the solver profile registered under ``name``."""
+    try:
+        return SOLVER_PROFILES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown solver profile '{name}'. Available profiles: {', '.join(SOLVER_PROFILES)}."
+        )
+
+
+def solver_parameters(profile, num_workers=0, concurrent_solves=1, log_search=False):
+    """Returns the CP-SAT parameters of ``profile`` for this machine.
+
+    ``num_workers`` search threads are used per solve; when 0, the cores are
+    shared between the ``concurrent_solves`` the server may run at once.
+    """
+    return {
+        **profile["parameters"],
+        "num_workers": num_workers or max(1, (os.cpu_count() or 1) // concurrent_solves),
+        "log_search_progress": log_search,
+    }
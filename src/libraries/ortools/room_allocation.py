@@ -0,0 +1,115 @@
+import heapq
+from bisect import bisect_left, insort
+
+from ortools.sat.python import cp_model
+
+# Seconds the exact matching of the sessions of one day may take
+EXACT_ALLOCATION_TIME_LIMIT = 10
+
+
+def allocate_rooms(sessions, courses, rooms, bookings=None):
+    """Assigns a room to every scheduled session once their times are placed.
+
+    ``rooms`` lists ``{"id", "capacity"}`` dicts; a session may only use a room
+    holding the ``students`` of its course. ``bookings`` lists rooms already
+    held by other schedules (``{"classroom_id", "day", "start_time",
+    "end_time"}``) which stay off limits while held. Each day is first swept in
+    start order: sessions starting together are matched to the free rooms, the
+    largest classes first, each taking the smallest room it fits in. The sweep
+    can miss a matching when sessions of different lengths overlap, so days it
+    leaves sessions without a room on are matched exactly with a small model.
+
+    Sessions whose record already has a ``classroom_id``, e.g. kept in place
+    by a re-plan, keep their room, which is held for the others meanwhile.
+    Sets ``classroom_id`` on every other session record, None when no room is
+    left, and returns how many sessions got a room, how many did not and how
+    many days needed the exact matching.
+    """
+    students = {course['id']: course.get('students') or 0 for course in courses}
+    rooms = sorted((room['capacity'], room['id']) for room in rooms)
+    held = {}
+    for booking in bookings or []:
+        held.setdefault((str(booking['day']), booking['classroom_id']), []).append(
+            (booking['start_time'], booking['end_time'])
+        )
+
+    def is_held(day, room_id, start_time, end_time):
+        return any(start < end_time and start_time < end for start, end in held.get((day, room_id), []))
+
+    stats = {"allocated": 0, "unallocated": 0, "exact_days": 0}
+    by_day = {}
+    for record in sessions:
+        if record.get('classroom_id') is not None:
+            held.setdefault((str(record['day']), record['classroom_id']), []).append(
+                (record['start_time'], record['end_time'])
+            )
+            stats["allocated"] += 1
+        else:
+            by_day.setdefault(str(record['day']), []).append(record)
+
+    for day, records in by_day.items():
+        if not sweep_day(records, students, rooms, lambda *args: is_held(day, *args)):
+            stats["exact_days"] += 1
+            match_day(records, students, rooms, lambda *args: is_held(day, *args))
+        for record in records:
+            stats["allocated" if record['classroom_id'] is not None else "unallocated"] += 1
+    return stats
+
+
+def sweep_day(records, students, rooms, is_held):
+    """Gives the sessions of a day the smallest free room they fit in, in start order; tells whether all got one."""
+    free = list(rooms)
+    # Rooms in use, as (end_time, capacity, id), released when the next sessions start
+    in_use = []
+    complete = True
+    records.sort(key=lambda record: (record['start_time'], -students[record['course_id']]))
+    for record in records:
+        while in_use and in_use[0][0] <= record['start_time']:
+            _, capacity, room_id = heapq.heappop(in_use)
+            insort(free, (capacity, room_id))
+
+        record['classroom_id'] = None
+        for i in range(bisect_left(free, (students[record['course_id']],)), len(free)):
+            capacity, room_id = free[i]
+            if not is_held(room_id, record['start_time'], record['end_time']):
+                del free[i]
+                heapq.heappush(in_use, (record['end_time'], capacity, room_id))
+                record['classroom_id'] = room_id
+                break
+        complete = complete and record['classroom_id'] is not None
+    return complete
+
+
+def match_day(records, students, rooms, is_held):
+    """Matches the sessions of a day to rooms with a model keeping each room to one session at a time.
+
+    Leaves the records of the sweep untouched and returns False when no
+    matching gives every session a room.
+    """
+    model = cp_model.CpModel()
+    choices = []
+    room_intervals = {}
+    for record in records:
+        options = []
+        for capacity, room_id in rooms:
+            if capacity < students[record['course_id']] or is_held(room_id, record['start_time'], record['end_time']):
+                continue
+            var = model.NewBoolVar(f"room{room_id}_{record['course_id']}_{record['start_time']}")
+            options.append((room_id, var))
+            room_intervals.setdefault(room_id, []).append(model.NewOptionalFixedSizeIntervalVar(
+                record['start_time'], record['end_time'] - record['start_time'], var, ""
+            ))
+        if not options:
+            return False
+        model.AddExactlyOne(var for _, var in options)
+        choices.append(options)
+    for intervals in room_intervals.values():
+        model.AddNoOverlap(intervals)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = EXACT_ALLOCATION_TIME_LIMIT
+    if solver.Solve(model) not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return False
+    for record, options in zip(records, choices):
+        record['classroom_id'] = next(room_id for room_id, var in options if solver.BooleanValue(var))
+    return True
@@ -0,0 +1,64 @@
+"""Add schedule_versions table and link sessions_subjects to it
+
+Revision ID: 3c1e5a7b9d20
+Revises: 8ef15c74d764, 95f52e16b279
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1e5a7b9d20'
+down_revision: Union[str, None] = ('8ef15c74d764', '95f52e16b279')
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('schedule_versions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('classes_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.Enum('Building', 'Active', 'Superseded', name='schedule_version_status_enum'), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('activated_at', sa.TIMESTAMP(), nullable=True),
+    sa.ForeignKeyConstraint(['classes_id'], ['classes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_schedule_versions_id'), 'schedule_versions', ['id'], unique=False)
+    op.create_index(op.f('ix_schedule_versions_classes_id'), 'schedule_versions', ['classes_id'], unique=False)
+    op.create_index('uq_schedule_versions_active_class', 'schedule_versions', ['classes_id'], unique=True,
+                    postgresql_where=sa.text("status = 'Active'"))
+
+    op.add_column('sessions_subjects', sa.Column('schedule_versions_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_sessions_subjects_schedule_versions_id'), 'sessions_subjects', ['schedule_versions_id'], unique=False)
+    op.create_foreign_key('sessions_subjects_schedule_versions_id_fkey', 'sessions_subjects', 'schedule_versions',
+                          ['schedule_versions_id'], ['id'], ondelete='CASCADE')
+
+    # Existing sessions become the active version of their class
+    op.execute("""
+        INSERT INTO schedule_versions (classes_id, status, created_at, activated_at)
+        SELECT DISTINCT a.classes_id, 'Active', now(), now()
+        FROM sessions_subjects s
+        JOIN assignments_subjects a ON a.id = s.assignments_subjects_id
+    """)
+    op.execute("""
+        UPDATE sessions_subjects s
+        SET schedule_versions_id = v.id
+        FROM assignments_subjects a, schedule_versions v
+        WHERE a.id = s.assignments_subjects_id AND v.classes_id = a.classes_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_constraint('sessions_subjects_schedule_versions_id_fkey', 'sessions_subjects', type_='foreignkey')
+    op.drop_index(op.f('ix_sessions_subjects_schedule_versions_id'), table_name='sessions_subjects')
+    op.drop_column('sessions_subjects', 'schedule_versions_id')
+    op.drop_index('uq_schedule_versions_active_class', table_name='schedule_versions')
+    op.drop_index(op.f('ix_schedule_versions_classes_id'), table_name='schedule_versions')
+    op.drop_index(op.f('ix_schedule_versions_id'), table_name='schedule_versions')
+    op.drop_table('schedule_versions')
+    sa.Enum(name='schedule_version_status_enum').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,46 @@
+from datetime import date, timedelta
+
+from src.libraries.ortools.decomposition import DecomposedSolver
+from src.libraries.ortools.interval_combinator import IntervalCombinator
+
+
+def make_arguments(weeks=3, time_limit=20):
+    """Two classes taught by two teachers over ``weeks`` weeks of courses."""
+    first_day = date(2025, 1, 6)
+    calendar = [
+        {"id": i, "date": first_day + timedelta(days=i), "type": "cours" if i % 7 < 5 else "entreprise"}
+        for i in range(7 * weeks)
+    ]
+    teachers = [
+        {"id": t, "name": f"Teacher {t}", "availability": {str(day['date']): [(480, 1200)] for day in calendar}}
+        for t in range(2)
+    ]
+    courses = [
+        {
+            "id": i + 1, "name": f"Course {i + 1}", "hourly_volume": 240 * 2 * weeks, "class_id": i % 2,
+            "start_date": first_day, "end_date": calendar[-1]['date'], "teacher": teachers[i // 2],
+        }
+        for i in range(4)
+    ]
+    return {
+        "calendar": calendar, "courses": courses, "session_duration": 240, "days_time_slot": (480, 1200),
+        "nb_rooms": 2, "time_quantum": 15, "preferred_windows": [(480, 720)], "objective_min_time": time_limit,
+    }
+
+
+def test_every_window_minimizes_the_objective():
+    # Each window only gets a third of the budget, which alone is below objective_min_time
+    arguments = make_arguments()
+    result = DecomposedSolver(IntervalCombinator, arguments, horizon_weeks=1, time_limit=20).solve()
+
+    assert result["status"] in ("OPTIMAL", "FEASIBLE")
+    assert len(result["stats"]["subproblem_stats"]) == 3
+    assert all(stats["optimized"] for stats in result["stats"]["subproblem_stats"])
+
+
+def test_short_budget_skips_the_objective_everywhere():
+    arguments = make_arguments()
+    result = DecomposedSolver(IntervalCombinator, arguments, horizon_weeks=1, time_limit=10).solve()
+
+    assert result["status"] in ("OPTIMAL", "FEASIBLE")
+    assert not any(stats["optimized"] for stats in result["stats"]["subproblem_stats"])